@@ -0,0 +1,3 @@
+"""
+Benchmarks of the interpreter pipeline, see benchmarks/bench.py.
+"""
@@ -0,0 +1,188 @@
+"""
+Benchmark suite of the interpreter pipeline. Random expressions over the grammar of the parser are generated with a fixed seed
+and each phase is timed separately for several sizes and depths of the expression trees:
+
+* tokenize - Tokenizer.tokenize of the expression text
+* parse - Parser.parse_expr of the expression text
+* simplify - simplification of the parsed expression
+* diff-k - one step of DerivativeTower, differentiation of the simplified derivative of order k-1 and simplification of the result
+* generate - PlotData.generate on the default domain and precision
+
+Every phase gets freshly parsed expressions, so the results are not served from the caches kept on the nodes.
+Expressions on which a phase raises an error are counted as failures, the time spent on them is included.
+
+Usage:
+
+    python -m benchmarks.bench [-o results.json] [--baseline baseline.json] [--tolerance 0.25]
+
+Results are written as JSON. If a baseline is given, the timings are compared against it and the exit code is 1 when
+some phase became slower by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from minigebra.interpreter.atoms import BUILT_IN_FUNCTIONS
+from minigebra.interpreter.derivatives import DerivativeTower
+from minigebra.interpreter.parser import Parser
+from minigebra.interpreter.profiler import count_nodes
+from minigebra.interpreter.sampling import PlotData
+from minigebra.interpreter.tokenizer import Tokenizer
+
+OPERATORS = ["+", "-", "*", "/", "^"]
+FUNCTIONS = [function.name for function in BUILT_IN_FUNCTIONS]
+
+def random_expression(rng: random.Random, size: int, depth: int) -> str:
+    """
+    Generates text of a random expression in variable x with at most size operators and function calls, nested at most depth levels deep.
+    Exponents are small integers, so the constants do not explode when they are folded.
+    """
+    if size <= 0 or depth <= 0:
+        return rng.choice(["x", "x", str(rng.randint(1, 9))])
+    if rng.random() < 0.2:
+        return f"{rng.choice(FUNCTIONS)}({random_expression(rng, size - 1, depth - 1)})"
+    operator = rng.choice(OPERATORS)
+    if operator == "^":
+        return f"({random_expression(rng, size - 1, depth - 1)} ^ {rng.randint(2, 3)})"
+    left = rng.randint(0, size - 1)
+    return f"({random_expression(rng, left, depth - 1)} {operator} {random_expression(rng, size - 1 - left, depth - 1)})"
+
+def corpus(seed: int, count: int, size: int, depth: int) -> list[str]:
+    """
+    Generates count random expressions, equal arguments give equal expressions.
+    """
+    rng = random.Random(f"{seed}-{size}-{depth}")
+    return [random_expression(rng, size, depth) for _ in range(count)]
+
+def parser() -> Parser:
+    return Parser(Tokenizer(), BUILT_IN_FUNCTIONS)
+
+def timed(func: callable, items: list) -> tuple[float, int]:
+    """
+    Applies func to every item. Returns the elapsed time in seconds and the number of items on which func failed.
+    """
+    failures = 0
+    start = time.perf_counter()
+    for item in items:
+        try:
+            func(item)
+        except Exception:
+            failures += 1
+    return time.perf_counter() - start, failures
+
+def measure(texts: list[str], diff_order: int, repeat: int) -> dict[str, tuple[float, int]]:
+    """
+    Times every phase on the expressions, the fastest of repeat runs is kept together with its number of failures.
+    """
+    best = {}
+    def keep(phase, result):
+        best[phase] = min(best.get(phase, result), result)
+
+    for _ in range(repeat):
+        tokenizer = Tokenizer()
+        keep("tokenize", timed(lambda text: list(tokenizer.tokenize(text)), texts))
+        p = parser()
+        keep("parse", timed(p.parse_expr, texts))
+
+        exprs = [p.parse_expr(text) for text in texts]
+        keep("simplify", timed(lambda expr: expr.simplify(), exprs))
+
+        towers = [DerivativeTower(p.parse_expr(text), lambda expr: expr.simplify()) for text in texts]
+        for order in range(1, diff_order + 1):
+            keep(f"diff-{order}", timed(lambda tower: tower[order], towers))
+
+        plots = [PlotData(p.parse_expr(text)) for text in texts]
+        with np.errstate(all="ignore"):
+            keep("generate", timed(lambda plot: plot.generate(), plots))
+    return best
+
+def run(sizes: list[int], depths: list[int], count: int = 50, repeat: int = 3, diff_order: int = 2, seed: int = 0) -> dict:
+    """
+    Runs the benchmarks for every combination of size and depth and returns the machine readable results.
+    """
+    results = []
+    for size in sizes:
+        for depth in depths:
+            texts = corpus(seed, count, size, depth)
+            nodes = np.mean([count_nodes(parser().parse_expr(text)) for text in texts])
+            for phase, (seconds, failures) in measure(texts, diff_order, repeat).items():
+                results.append({
+                    "phase": phase,
+                    "size": size,
+                    "depth": depth,
+                    "nodes": float(nodes),
+                    "count": count,
+                    "failures": failures,
+                    "seconds": seconds,
+                    "throughput": count / seconds if seconds > 0 else float("inf"),
+                })
+    meta = {
+        "seed": seed,
+        "count": count,
+        "repeat": repeat,
+        "diff_order": diff_order,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+    return {"meta": meta, "results": results}
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25) -> list[dict]:
+    """
+    Compares the timings with the baseline. Returns one entry per phase present in both, regressions are marked.
+    """
+    old = {(r["phase"], r["size"], r["depth"]): r["seconds"] for r in baseline["results"]}
+    comparison = []
+    for r in results["results"]:
+        key = (r["phase"], r["size"], r["depth"])
+        if key in old and old[key] > 0:
+            ratio = r["seconds"] / old[key]
+            comparison.append({"phase": r["phase"], "size": r["size"], "depth": r["depth"], "ratio": ratio, "regression": ratio > 1 + tolerance})
+    return comparison
+
+def report(results: dict, comparison: list[dict] = None) -> str:
+    """
+    Formats the results as a table for people.
+    """
+    ratios = {(c["phase"], c["size"], c["depth"]): c for c in comparison or []}
+    lines = [f"{'phase':<10}{'size':>6}{'depth':>7}{'nodes':>9}{'expr/s':>12}{'failures':>10}{'vs baseline':>14}"]
+    for r in results["results"]:
+        c = ratios.get((r["phase"], r["size"], r["depth"]))
+        versus = "" if c is None else f"{c['ratio']:.2f}x" + (" !" if c["regression"] else "")
+        lines.append(f"{r['phase']:<10}{r['size']:>6}{r['depth']:>7}{r['nodes']:>9.1f}{r['throughput']:>12.1f}{r['failures']:>10}{versus:>14}")
+    return "\n".join(lines)
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line entry point of the benchmarks.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench", description="Benchmarks the tokenizer, parser, simplifier, differentiator and evaluator.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64], help="numbers of operators of the expressions")
+    parser.add_argument("--depths", type=int, nargs="+", default=[4, 8, 16], help="maximal depths of the expressions")
+    parser.add_argument("--count", type=int, default=50, help="number of expressions of each size and depth")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs, the fastest one is kept")
+    parser.add_argument("--diff-order", type=int, default=2, help="highest timed order of differentiation")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random expressions")
+    parser.add_argument("-o", "--output", help="file for the results in JSON")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.depths, args.count, args.repeat, args.diff_order, args.seed)
+    comparison = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            comparison = compare(results, json.load(file), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+    print(report(results, comparison))
+    return 1 if comparison and any([c["regression"] for c in comparison]) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Runs a small configuration of the benchmarks under pytest, e.g. python -m pytest benchmarks.
+"""
+from benchmarks import bench
+
+PHASES = ["tokenize", "parse", "simplify", "diff-1", "generate"]
+
+def test_corpus_is_seeded():
+    assert bench.corpus(1, 5, 8, 4) == bench.corpus(1, 5, 8, 4)
+    assert bench.corpus(1, 5, 8, 4) != bench.corpus(2, 5, 8, 4)
+
+def test_random_expressions_parse():
+    p = bench.parser()
+    for text in bench.corpus(0, 20, 16, 8):
+        assert bench.count_nodes(p.parse_expr(text)) > 1
+
+def test_run_reports_every_phase():
+    results = bench.run([2, 8], [4], count=5, repeat=1, diff_order=1)
+    assert [r["phase"] for r in results["results"]] == PHASES * 2
+    assert all([r["seconds"] > 0 and r["throughput"] > 0 for r in results["results"]])
+
+def test_compare_marks_regressions():
+    results = bench.run([2], [2], count=3, repeat=1, diff_order=1)
+    slower = {"results": [dict(r, seconds=r["seconds"] / 2) for r in results["results"]]}
+    assert all([c["regression"] for c in bench.compare(results, slower, tolerance=0.5)])
+    assert not any([c["regression"] for c in bench.compare(results, results, tolerance=0.5)])
@@ -0,0 +1,47 @@
+// Patches the board in place, so only changed formulas are typeset again.
+
+// sections: [id, heading] in the order they are shown
+// entries: [id, section id, latex] of the changed formulas
+// keep: ids of all nodes that are shown, other nodes are removed
+function patch(sections, entries, keep) {
+    const board = document.getElementById("board");
+    for (const [id, heading] of sections) {
+        let section = document.getElementById(id);
+        if (!section) {
+            section = document.createElement("div");
+            section.id = id;
+            section.dataset.board = "";
+            section.appendChild(document.createElement("h3"));
+            board.appendChild(section);
+        }
+        section.firstChild.textContent = heading;
+    }
+
+    const changed = [];
+    for (const [id, parent, latex] of entries) {
+        let node = document.getElementById(id);
+        if (!node) {
+            node = document.createElement("p");
+            node.id = id;
+            node.dataset.board = "";
+            node.align = "center";
+            document.getElementById(parent).appendChild(node);
+        } else if (window.MathJax && MathJax.typesetClear) {
+            MathJax.typesetClear([node]);
+        }
+        node.textContent = latex;
+        changed.push(node);
+    }
+
+    const shown = new Set(keep);
+    for (const node of Array.from(document.querySelectorAll("[data-board]"))) {
+        if (!shown.has(node.id)) {
+            node.remove();
+        }
+    }
+
+    // before MathJax is loaded, its startup typesets the whole page
+    if (window.MathJax && MathJax.startup && MathJax.startup.promise) {
+        MathJax.startup.promise = MathJax.startup.promise.then(() => MathJax.typesetPromise(changed));
+    }
+}
@@ -1,76 +1,115 @@
+import json
+import os
+
 import dominate
-from dominate.tags import script, link, style, div, h3, p
-from PyQt5.QtWebEngineWidgets import QWebEngineView
+from dominate.tags import script, link, div
+from PyQt5.QtCore import QUrl
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
+
+from ..interpreter.cache import LRUCache
+from ..interpreter.profiler import profiler
 
 # for type hinting
 from ..interpreter.database import Database
-from .canvas import PlotData
+from ..interpreter.atoms import Atom
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+MATHJAX_CDN = "https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js"
 
 class Board(QWebEngineView):
     """
     This class provides a widget for rendering latex in the gui.
-    This widget basically displays a html file with embedded MathJax.
+    This widget basically displays a html file with embedded MathJax. The page is loaded once, later inputs patch only
+    the formulas that changed through javascript and MathJax typesets just these.
     """
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.latex = LRUCache(1024) # expression -> rendered latex, keyed by the structural hash of the expression
+        self.shown = {} # id of a formula -> latex shown on the page
+        self.loaded = False
+        self.pending = [] # scripts submitted before the page finished loading
+        self.loadFinished.connect(self.__loaded)
+        # the page is local, it reaches the network only for the MathJax fallback
+        self.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
         self.doc = self.new_doc()
-        self.rewrite()
-        self.setHtml(str(self.doc))
+        self.setHtml(str(self.doc), QUrl.fromLocalFile(ASSETS + os.sep))
 
     def new_doc(self) -> dominate.document:
         """
-        Creates new blank document that will be displayed in the gui.
+        Creates new blank document that will be displayed in the gui. Its assets are loaded from the assets directory,
+        MathJax is taken from the CDN only if it is not bundled in assets/mathjax.
         """
+        mathjax = "mathjax/tex-chtml.js" if os.path.exists(os.path.join(ASSETS, "mathjax", "tex-chtml.js")) else MATHJAX_CDN
         doc = dominate.document()
         with doc.head:
-            script(src="https://polyfill.io/v3/polyfill.min.js?features=es6")
-            script(type="text/javascript", id="MathJax-script",src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js")
-            link(rel="stylesheet", href="https://www.w3schools.com/w3css/4/w3.css")
-            style(".MathJax {font-size: 1.5em !important;}")
+            link(rel="stylesheet", href="board.css")
+            script(type="text/javascript", src="board.js")
+            script(type="text/javascript", id="MathJax-script", src=mathjax)
+        with doc:
+            div(id="board")
         return doc
 
     def rewrite(self, database: Database = None) -> None:
         """
         Writes information about the program onto the widget. Information is stored in an instance of Database class.
+        Only formulas whose latex differs from the shown one are sent to the page.
         """
         if database:
-            data = database.plot_data
-            self.doc = self.new_doc()
-            with self.doc:
-                self.attribute("Variables:", "".join([i + ", " for i in database.variables])[:-2])
-                self.attribute("Parameters:", "".join([i + ", " for i in database.parameters])[:-2])
-                self.attribute("Order of differentiation:", database.diff_order)
-                self.attribute("Domain:", database.domain)
-                self.attribute("Precision:", database.precision)
-                if len(data)> 0 and len(data[0]) > 0:
-                    self.expressions(data[0])
-                    if len(data) > 1:
-                        for i in range(1,len(data)):
-                            self.derivations(i, data[i])
-            self.setHtml(str(self.doc))
+            with profiler.phase("board"):
+                self.__rewrite(database)
+
+    def __rewrite(self, database: Database) -> None:
+        sections, entries = self.layout(database)
+        changed = [entry for entry in entries if self.shown.get(entry[0]) != entry[2]]
+        self.shown = {id: text for id, _, text in entries}
+        keep = [id for id, _ in sections] + list(self.shown)
+        self.run(f"patch({json.dumps(sections)}, {json.dumps(changed)}, {json.dumps(keep)});")
 
-    @div
-    def attribute(self, name: str, text: str) -> None:
+    def layout(self, database: Database) -> tuple[list]:
         """
-        Creates a html element that displays a heading3 "name" and paragraph "text".
+        Lists the sections of the board as (id, heading) and their formulas as (id, section id, latex).
         """
-        h3(name)
-        p(f"$${text}$$", align="center")
+        data = database.plot_data
+        sections, entries = [], []
+        attributes = [
+            ("Variables:", ", ".join(database.variables)),
+            ("Parameters:", ", ".join(database.parameters)),
+            ("Order of differentiation:", database.diff_order),
+            ("Domain:", database.domain),
+            ("Precision:", database.precision),
+        ]
+        for i, (name, text) in enumerate(attributes):
+            sections.append((f"attribute-{i}", name))
+            entries.append((f"attribute-{i}-value", f"attribute-{i}", f"$${text}$$"))
+        if len(data) > 0 and len(data[0]) > 0:
+            for n, group in enumerate(data):
+                heading = "Expressions:" if n == 0 else f"Derivative of {n}-th order"
+                sections.append((f"order-{n}", heading))
+                for i, plot in enumerate(group):
+                    entries.append((f"order-{n}-{i}", f"order-{n}", self.render(plot.expr)))
+        return sections, entries
 
-    @div(h3("Expressions:"))
-    def expressions(self, exprs: list[PlotData]) -> None:
+    def render(self, expr: Atom) -> str:
         """
-        Creates a html element that displays expressions in latex.
+        Returns the latex of the expression, equal expressions are rendered only once.
         """
-        for expr in exprs:
-            p(expr.expr.print("mathjax2"), align="center")
+        text = self.latex.get(expr)
+        if text is None:
+            text = expr.print("mathjax2")
+            self.latex.put(expr, text)
+        return text
 
-    @div
-    def derivations(self, n: int, diffs: list[PlotData]) -> None:
+    def run(self, code: str) -> None:
         """
-        Creates a html element that displays differentiations of expressions in latex.
+        Runs javascript on the page, scripts submitted before the page is loaded run once it is.
         """
-        h3(f"Derivative of {n}-th order")
-        for diff in diffs:
-            p(diff.expr.print("mathjax2"), align="center")
+        if self.loaded:
+            self.page().runJavaScript(code)
+        else:
+            self.pending.append(code)
 
+    def __loaded(self, ok: bool) -> None:
+        self.loaded = True
+        for code in self.pending:
+            self.page().runJavaScript(code)
+        self.pending = []
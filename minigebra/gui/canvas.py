@@ -2,6 +2,7 @@ import matplotlib
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
 
 import matplotlib.pyplot as plt
 colors = plt.rcParams["axes.prop_cycle"]()
@@ -11,36 +12,25 @@ from PyQt5.QtWidgets import QVBoxLayout, QWidget
 
 import numpy as np
 
-class PlotData:
-    """
-    This data type stores information about an expression to be plotted.
-    """
-    def __init__(self, expr, vars: list[str] = ["x"], domain: tuple[int] = (-10,10), precision:float = 0.01) -> None:
-        self.expr = expr # Atom like expr
-        self.domain = domain
-        self.precision = precision
-        self.vars = vars
-
-    def generate(self) -> tuple[np.ndarray]:
-        """
-        Generates data for plotting.
-        """
-        a,b = self.domain
-        num = int(np.abs(b-a)/self.precision)
-        x = np.linspace(a,b,num)
-        y = np.array([self.expr({self.vars[0]:i}) for i in x])
-        return x,y
+from ..interpreter.sampling import PlotData
+from ..interpreter.profiler import profiler
 
 class Canvas(QWidget):
     """
     This class represents a canvas where plots are plotted.
+    Axes and lines are kept between inputs. Lines and titles are animated artists, they are drawn over a cached
+    background of their axis, so a changed plot is redrawn by blitting only its axis.
     """
     def __init__(self) -> None:
         super().__init__()
         self.fig = Figure(dpi=50)
+        self.plots = {} # axis -> (PlotData, Line2D) of the plot in the axis
+        self.lines = {} # axis -> Line2D kept for the lifetime of the axis
+        self.backgrounds = {} # axis -> (region, pixels) of the axis without animated artists
         self.create_grid_axes()
         self.clear_axes()
         self.canvas = FigureCanvasQTAgg(self.fig)
+        self.canvas.mpl_connect("draw_event", self.cache_background)
         self.toolbar = NavigationToolbar(self.canvas, None)
 
         layout = QVBoxLayout()
@@ -70,6 +60,9 @@ class Canvas(QWidget):
         Removes plotting slots from the grid.
         """
         [self.fig.delaxes(ax) for ax in self.axes.flatten()]
+        self.plots = {}
+        self.lines = {}
+        self.backgrounds = {}
 
     def new_grid(self, rows=1, cols=1) -> None:
         """
@@ -84,16 +77,24 @@ class Canvas(QWidget):
         Specifies the style of the plots that are shown in the canvas.
         """
         for axis in self.axes.flatten():
-            axis.clear()
-            axis.hlines(0,-100,100,colors = 'dimgrey')
-            axis.vlines(0,-100,100,colors = 'dimgrey')
-            axis.set_xlim(left=-10, right=10)
-            axis.set_ylim(bottom=-10, top=10)
-            axis.grid(True)
-            axis.spines['left'].set_position(('axes',0))
-            axis.spines['bottom'].set_position(('axes',0))
-            axis.xaxis.set_ticks_position('bottom')
-            axis.yaxis.set_ticks_position('left')
+            self.set_axis_style(axis)
+
+    def set_axis_style(self, axis) -> None:
+        """
+        Specifies the style of a single plot in the canvas and creates the line of the plot.
+        """
+        axis.clear()
+        axis.axhline(0, color = 'dimgrey')
+        axis.axvline(0, color = 'dimgrey')
+        axis.set_ylim(bottom=-10, top=10)
+        axis.grid(True)
+        axis.spines['left'].set_position(('axes',0))
+        axis.spines['bottom'].set_position(('axes',0))
+        axis.xaxis.set_ticks_position('bottom')
+        axis.yaxis.set_ticks_position('left')
+        axis.title.set_animated(True)
+        self.lines[axis], = axis.plot([], [], linewidth = 5, color = next(colors)["color"], animated = True)
+        axis.callbacks.connect("xlim_changed", self.resample)
 
     def compute_grid_size(self, image_count: int) -> tuple[int]:
         """
@@ -105,21 +106,117 @@ class Canvas(QWidget):
             i+=1
         return (factor-i,factor)
 
-    def montage(self, datasets: list[list[PlotData]]) -> None:
+    def montage(self, datasets: list[list[PlotData]], changed: list[int] = None) -> None:
         """
         Displays several plots on the plotting canvas.
+        If the grid keeps its dimensions, its axes and lines are reused. If changed holds indices of the changed expressions,
+        only plots of these expressions and their derivatives are updated, and if no axis needs a full draw they are blitted.
         """
+        with profiler.phase("montage"):
+            self.__montage(datasets, changed)
+
+    def __montage(self, datasets: list[list[PlotData]], changed: list[int]) -> None:
+        count = len(datasets[0]) if len(datasets) > 0 else 0
         datasets = [item for sub_list in datasets for item in sub_list]
         if len(datasets) > 0:
-            x, y  = self.compute_grid_size(len(datasets))
-            self.new_grid(x,y)
-            for i, axis in enumerate(self.axes.flatten()):
-                try:
-                    x,y = datasets[i].generate()
-                    c = next(colors)["color"]
-                    axis.plot(x,y, linewidth = 5, color = c)
-                    axis.set_title(datasets[i].expr.print("mathjax1"), fontsize=30)
-                except IndexError:
-                    axis.clear()
-                    axis.axis("off")
-            self.canvas.draw()
+            rows, cols  = self.compute_grid_size(len(datasets))
+            if self.axes.shape != (int(rows), int(cols)) or not self.lines:
+                self.new_grid(rows,cols)
+                indices = range(self.axes.size)
+            elif changed is None:
+                indices = range(self.axes.size)
+            else:
+                indices = [order*count + i for order in range(len(datasets) // count) for i in changed]
+
+            redraw = False
+            for i in indices:
+                axis = self.axes.flat[i]
+                redraw = not self.update_axis(axis, datasets[i] if i < len(datasets) else None) or redraw
+            if redraw:
+                self.canvas.draw()
+            else:
+                [self.blit(self.axes.flat[i]) for i in indices]
+
+    def update_axis(self, axis, data: PlotData) -> bool:
+        """
+        Shows the plot of data in the axis, or hides the axis if data is None.
+        Returns False if the static content of the axis changed, so it cannot be blitted.
+        """
+        line = self.lines[axis]
+        try:
+            if data is None:
+                raise IndexError
+            x,y = data.generate()
+        except IndexError:
+            self.plots.pop(axis, None)
+            line.set_data([], [])
+            axis.set_title("")
+            if axis.axison:
+                axis.axis("off")
+                return False
+            return True
+        static = axis.axison and axis.get_xlim() == tuple(data.domain)
+        axis.axis("on")
+        if axis.get_xlim() != tuple(data.domain):
+            # the plot is registered only after the limits are set, so resample does not replace the samples of the new data,
+            # it resamples only when the user pans or zooms
+            self.plots.pop(axis, None)
+            axis.set_xlim(*data.domain)
+        self.plots[axis] = (data, line)
+        line.set_data(x,y)
+        axis.set_title(data.expr.print("mathjax1"), fontsize=30)
+        return static and self.fits(axis)
+
+    def cache_background(self, event) -> None:
+        """
+        Saves the background of every axis after a full draw, then draws the animated artists over it.
+        The region of an axis spans the axis and its title.
+        """
+        if self.canvas.is_saving():
+            return
+        renderer = event.renderer
+        self.backgrounds = {}
+        for axis in self.lines:
+            box = axis.bbox
+            top = max(box.y1, axis.title.get_window_extent(renderer).y1) if axis.get_title() else box.y1
+            region = Bbox([[box.x0, box.y0], [box.x1, top]])
+            self.backgrounds[axis] = (region, self.canvas.copy_from_bbox(region))
+            self.draw_animated(axis)
+
+    def fits(self, axis) -> bool:
+        """
+        Checks whether the title of the axis lies within the cached region of the axis.
+        """
+        if axis not in self.backgrounds:
+            return False
+        region, _ = self.backgrounds[axis]
+        extent = axis.title.get_window_extent(self.canvas.get_renderer())
+        return region.x0 <= extent.x0 and extent.x1 <= region.x1 and extent.y1 <= region.y1
+
+    def draw_animated(self, axis) -> None:
+        """
+        Draws the line and the title of the axis.
+        """
+        axis.draw_artist(self.lines[axis])
+        axis.draw_artist(axis.title)
+
+    def blit(self, axis) -> None:
+        """
+        Redraws only the region of the axis: restores its background and draws its animated artists over it.
+        """
+        region, background = self.backgrounds[axis]
+        self.canvas.restore_region(background)
+        self.draw_animated(axis)
+        self.canvas.blit(region)
+
+    def resample(self, axis) -> None:
+        """
+        Resamples the plot in the axis when its visible range changes, e.g. by panning or zooming.
+        Only the visible range is sampled, with a resolution given by the width of the axis in pixels.
+        """
+        if axis not in self.plots:
+            return
+        data, line = self.plots[axis]
+        start, stop = axis.get_xlim()
+        line.set_data(*data.view(start, stop, int(axis.bbox.width)))
+        self.canvas.draw_idle()
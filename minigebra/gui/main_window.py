@@ -3,8 +3,10 @@ from PyQt5.QtGui import QIcon
 
 from .canvas import Canvas 
 from .sidebar import Sidebar
+from .worker import Worker
 
 from ..interpreter import Interpreter
+from ..interpreter.profiler import profiler
 
 
 class MainWindow(QMainWindow):
@@ -21,6 +23,8 @@ class MainWindow(QMainWindow):
         self.canvas = Canvas()
         self.sidebar = Sidebar()
         self.interpreter = Interpreter()
+        self.worker = Worker(self.interpreter)
+        self.worker.finished.connect(self.show_results)
         self.sidebar.input.editingFinished(self.process_input)
 
         widget = QWidget()
@@ -33,16 +37,26 @@ class MainWindow(QMainWindow):
         self.show()
 
     def process_input(self, text: str) -> None:
-        if text == "":
-            self.canvas.reset_axes()
-            self.canvas.create_grid_axes()
-            self.canvas.clear_axes()
-            self.canvas.canvas.draw()
-        elif text:
-            try:
-                self.interpreter.interpret_text(text)
-                self.interpreter.generate_data()
-                self.canvas.montage(self.interpreter.database.plot_data)
-                self.sidebar.board.rewrite(self.interpreter.database)
-            except Exception as e:
-                print(e)
+        """
+        Interprets the input in the background, the results are shown once they are ready.
+        """
+        if text is not None:
+            self.worker.submit(text)
+
+    def show_results(self, database, profile) -> None:
+        """
+        Draws plots and expressions of the interpreted input. Runs in the gui thread.
+        If profiling is on, the timings of the input, recorded by the worker in profile, are printed once it is drawn.
+        """
+        try:
+            if not database.towers:
+                self.canvas.reset_axes()
+                self.canvas.create_grid_axes()
+                self.canvas.clear_axes()
+                self.canvas.canvas.draw()
+            elif database.changed != []:
+                self.canvas.montage(database.plot_data, database.changed)
+                self.sidebar.board.rewrite(database)
+        except Exception as e:
+            print(e)
+        profiler.report(snapshot=profile)
@@ -0,0 +1,104 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+import copy
+import threading
+
+from ..interpreter.atoms import simplifiers
+from ..interpreter.profiler import profiler
+
+# for type hinting
+from ..interpreter import Interpreter
+
+class JobSignals(QObject):
+    """
+    Signals emitted by a job from the worker thread. They are delivered to the thread of the receiver, i.e. the gui thread.
+    """
+    finished = pyqtSignal(int, object, object) # generation, snapshot of the database, snapshot of the profiler
+    failed = pyqtSignal(int, object) # generation, exception
+
+class InterpreterJob(QRunnable):
+    """
+    Interprets an input and samples the plots of its expressions. Runs in a worker thread.
+    """
+    def __init__(self, interpreter: Interpreter, text: str, generation: int, cancellation: threading.Event, signals: JobSignals):
+        super().__init__()
+        self.interpreter = interpreter
+        self.text = text
+        self.generation = generation
+        self.cancellation = cancellation
+        self.signals = signals
+
+    def check(self) -> None:
+        """
+        Interrupts the job if a newer input was submitted.
+        """
+        if self.cancellation.is_set():
+            raise simplifiers.Cancelled()
+
+    def run(self) -> None:
+        with simplifiers.cancellable(self.cancellation):
+            try:
+                self.check()
+                database = self.interpreter.database
+                if self.text == "":
+                    database.towers = []
+                else:
+                    self.interpreter.interpret_text(self.text)
+                    self.check()
+                    if database.changed != []:
+                        self.interpreter.generate_data()
+                        for plot in [plot for group in database.plot_data for plot in group]:
+                            self.check()
+                            try:
+                                plot.generate()
+                            except Exception:
+                                # reported when the plot is drawn
+                                pass
+                # the next job modifies the database and records its phases while the gui draws this one
+                self.signals.finished.emit(self.generation, copy.copy(database), profiler.snapshot())
+            except Exception as e:
+                # phases of an interrupted input are not reported with the next one
+                profiler.reset()
+                self.signals.failed.emit(self.generation, e)
+
+class Worker(QObject):
+    """
+    Runs the interpreter in a background thread, so the gui stays responsive while the input is interpreted and the plots are sampled.
+    Every input gets a generation id. Submitting an input cancels the older jobs and results of older generations are dropped,
+    only the result of the latest input is emitted.
+    """
+    finished = pyqtSignal(object, object) # database with results of the latest input, snapshot of its profile
+
+    def __init__(self, interpreter: Interpreter):
+        super().__init__()
+        self.interpreter = interpreter
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1) # the interpreter holds the state of the previous input, so jobs run one after another
+        self.generation = 0
+        self.cancellation = threading.Event()
+        self.stale = False # a dropped job changed the database, so the next result has to be drawn in full
+        self.signals = JobSignals()
+        self.signals.finished.connect(self.__finished)
+        self.signals.failed.connect(self.__failed)
+
+    def submit(self, text: str) -> None:
+        """
+        Cancels older jobs and starts interpreting the text.
+        """
+        self.cancellation.set()
+        self.cancellation = threading.Event()
+        self.generation += 1
+        self.pool.start(InterpreterJob(self.interpreter, text, self.generation, self.cancellation, self.signals))
+
+    def __finished(self, generation: int, database, profile) -> None:
+        if generation != self.generation:
+            self.stale = True
+            return
+        if self.stale:
+            database.changed = None
+            self.stale = False
+        self.finished.emit(database, profile)
+
+    def __failed(self, generation: int, error: Exception) -> None:
+        self.stale = True
+        if generation == self.generation and not isinstance(error, simplifiers.Cancelled):
+            print(error)
@@ -1,26 +1,124 @@
-import ast
+import weakref
+from fractions import Fraction
 import numpy as np
 
 from . import simplifiers as simplifiers
 from . import formatters as formatters
 from . import differentiators as differentiators
+from . import compilers as compilers
+
+# sets attributes of a node while it is constructed, without the check of Atom.__setattr__
+_setattr = object.__setattr__
+
+def _helper(table: dict, module, cls: type):
+    """
+    Finds the helper of the node type in the module, i.e. the class of the same name as the node type or as its closest base.
+    Helpers are stateless, a single instance per node type is kept in the table.
+    """
+    for base in cls.__mro__:
+        helper = getattr(module, base.__name__, None)
+        if helper is not None:
+            table[cls] = helper()
+            return table[cls]
+    raise TypeError(f"{module.__name__} has no helper for {cls.__name__}.")
+
+def _to_atom(value):
+    if type(value) == int or type(value) == float:
+        return Num(value)
+    return value
+
+def _join(operation, left, right):
+    """
+    Joins two operands into a single n-ary node of the operation. Operands which are nodes of the same operation are flattened.
+    """
+    args = []
+    for operand in (left, right):
+        args += operand.args if type(operand) == operation else (operand,)
+    return operation(args)
+
+def negate(expr):
+    """
+    Returns the expression with the opposite sign. The sign is folded into a number or into the coefficient of a product,
+    other expressions are multiplied by -1.
+    """
+    if type(expr) == Num:
+        return Num(-expr.num)
+    elif type(expr) == Product and type(expr.args[0]) == Num:
+        coefficient = -expr.args[0].num
+        if coefficient == 1 and len(expr.args) == 2:
+            return expr.args[1]
+        return Product((Num(coefficient),) + expr.args[1:]) if coefficient != 1 else Product(expr.args[1:])
+    elif type(expr) == Product:
+        return Product((Num(-1),) + expr.args)
+    return Product([Num(-1), expr])
+
+# node type -> helper of the node type
+_FORMATTERS = {}
+_DIFFERENTIATORS = {}
+_COMPILERS = {}
 
 class Atom:
     """
     Provides representation of atomic expressions in python code. Each expression is of type Atom or one of it's children.
     Each Atom provides functionality such as pretty printing, simplification, differentiation and evaluation.
+    Nodes declare their fields in __slots__, so they carry no instance dictionary. Every subclass has to declare __slots__ as well.
     """
-    def __init__(self):
-        self.init_args = ()
+    __slots__ = ("_hash", "_frozen", "_simplified", "_derivative", "_kernels", "_text", "_latex", "__weakref__")
+
+    def _key(self) -> tuple:
+        """
+        Returns the components which determine the structure of the node. Child nodes are compared by their own cached hashes.
+        """
+        return ()
+
+    def _freeze(self) -> None:
+        """
+        Computes the structural hash of the node and forbids further changes to it.
+        """
+        _setattr(self, "_hash", hash((type(self), self._key())))
+        _setattr(self, "_frozen", True)
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"{type(self).__name__} expressions are immutable.")
+        _setattr(self, name, value)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        elif not isinstance(other, Atom):
+            return NotImplemented
+        return type(self) == type(other) and self._hash == other._hash and self._key() == other._key()
+
+    def intern(self):
+        """
+        Returns the shared instance of a structurally equal expression. Identical subtrees of interned expressions are one object,
+        so comparing them is an identity check.
+        """
+        node = self._intern_children()
+        key = (type(node),) + tuple([id(i) if isinstance(i, Atom) else i for i in node._key()])
+        return _INTERN_TABLE.setdefault(key, node)
+
+    def _intern_children(self):
+        return self
+
+    def children(self) -> tuple:
+        """
+        Returns the direct subexpressions of the expression.
+        """
+        return ()
 
     def __add__(self, other):
-        return self.__work_with_numbers(Plus, other)
+        return _join(Sum, self, _to_atom(other))
     
     def __sub__(self, other):
-        return self.__work_with_numbers(Minus, other)
+        return _join(Sum, self, negate(_to_atom(other)))
     
     def __mul__(self, other):
-        return self.__work_with_numbers(Mul, other)
+        return _join(Product, self, _to_atom(other))
 
     def __truediv__(self, other):
         return self.__work_with_numbers(Div, other)
@@ -28,137 +126,270 @@ class Atom:
     def __pow__(self, other):
         return self.__work_with_numbers(Expon, other)
 
-    def get_simplifier(self):
-        name = self.__class__.__name__
-        func = eval(f"simplifiers.{name}")
-        return func(*self.init_args)
-
     def simplify(self):
-        return self.get_simplifier().simplify()
+        return simplifiers.simplify(self)
 
     def simplify_expr(self):
-        return self.get_simplifier().simplify_expr()
-
-    def simplify_list(self):
-        return self.get_simplifier().simplify_list()
+        return simplifiers.simplify_expr(self)
 
     def get_differentiator(self):
-        name = self.__class__.__name__
-        func = eval(f"differentiators.{name}")
-        return func(*self.init_args)
+        try:
+            return _DIFFERENTIATORS[type(self)]
+        except KeyError:
+            return _helper(_DIFFERENTIATORS, differentiators, type(self))
 
     def diff(self):
-        return self.get_differentiator().diff()
+        """
+        Differentiates the expression. The derivative of each node is remembered, so shared subtrees are differentiated only once.
+        """
+        derivative = getattr(self, "_derivative", None)
+        if derivative is None:
+            derivative = self.get_differentiator().diff(self)
+            _setattr(self, "_derivative", derivative)
+        return derivative
 
     def get_formatter(self):
-        name = self.__class__.__name__
-        func =  eval(f"formatters.{name}")
-        return func(*self.init_args)
+        try:
+            return _FORMATTERS[type(self)]
+        except KeyError:
+            return _helper(_FORMATTERS, formatters, type(self))
 
     def __repr__(self):
-        return self.get_formatter().string_format()
-
-    def to_ast(self, list_):
-        return list_[0]
+        return self.get_formatter().string_format(self)
 
-    def to_list(self):
-        return [self]
+    def get_compiler(self):
+        try:
+            return _COMPILERS[type(self)]
+        except KeyError:
+            return _helper(_COMPILERS, compilers, type(self))
+
+    def compile(self, vars: list[str]) -> callable:
+        """
+        Lowers the expression into a single generated python function which accepts values of vars as positional arrays or scalars.
+        The function is cached on the expression, so repeated plotting reuses it instead of walking the tree again.
+        """
+        kernels = getattr(self, "_kernels", None)
+        if kernels is None:
+            kernels = {}
+            _setattr(self, "_kernels", kernels)
+        key = tuple(vars)
+        if key not in kernels:
+            kernels[key] = compilers.compile_kernel([self], vars)
+        return kernels[key]
 
     def eval(dict: dict) -> float:
         pass
 
+    def eval_array(self, dict: dict) -> np.ndarray:
+        """
+        Evaluates the expression on whole arrays of variable values at once. Each node is evaluated only once with numpy ufuncs.
+        The result has the broadcasted shape of the arrays in dict, even for constant expressions.
+        """
+        with np.errstate(all="ignore"):
+            values = self._eval_array(dict)
+        shape = np.broadcast_shapes(*[np.shape(value) for value in dict.values()])
+        return np.broadcast_to(values, shape).astype(float)
+
+    def _eval_array(self, dict: dict) -> np.ndarray:
+        return self.eval(dict)
+
     def __call__(self, *args):
         return self.eval(*args)
 
     def __work_with_numbers(self, operation, other):
-        if type(other) == int or type(other) == float:
-            return operation(self, Num(other))
-        else:
-            return operation(self, other)
+        return operation(self, _to_atom(other))
 
     def print(self, option:str):
         if option == "mathjax1":
-            return self.get_formatter().mathjax_format1()
+            return self.get_formatter().mathjax_format1(self)
         elif option == "mathjax2":
-            return self.get_formatter().mathjax_format2()
+            return self.get_formatter().mathjax_format2(self)
         elif option == "latex":
-            return self.get_formatter().latex_format()
+            return self.get_formatter().latex_format(self)
         else:
             return str(self)
 
 
 class BinaryOperator(Atom):
+    __slots__ = ("left", "right")
     def __init__(self, left, right):
-        super().__init__()
-        self.left = left
-        self.right = right
-        self.init_args = (self.left, self.right, self)
+        _setattr(self, "left", left)
+        _setattr(self, "right", right)
+        self._freeze()
 
-    def _to_list(self, operation):
-        a=[]; b=[]
-        left=self.left; right=self.right
+    def _key(self):
+        return (self.left, self.right)
 
-        if type(left) == operation:
-            a = left.to_list()
-        else:
-            a.append(left)
-        
-        if type(right) == operation:
-            b = right.to_list()
-        else:
-            b.append(right)
-        
-        return a+b
-
-    def _to_ast(self, list_, operation):
-        if len(list_) == 1:
-            return list_[0]
-        else:
-            return operation(list_[0], self._to_ast(list_[1:], operation))
+    def children(self):
+        return (self.left, self.right)
 
-    def to_list(self):
-        return self._to_list(type(self))
-
-    def to_ast(self, list_):
-        return self._to_ast(list_, type(self))
+    def _intern_children(self):
+        left = self.left.intern()
+        right = self.right.intern()
+        if left is self.left and right is self.right:
+            return self
+        return type(self)(left, right)
 
 class Div(BinaryOperator):
+    __slots__ = ()
     def eval(self, dict: dict):
         return self.left.eval(dict) / self.right.eval(dict)
 
+    def _eval_array(self, dict: dict):
+        return np.divide(self.left._eval_array(dict), self.right._eval_array(dict))
+
 class Mul(BinaryOperator):
+    __slots__ = ()
     def eval(self, dict: dict):
         return self.left.eval(dict) * self.right.eval(dict)
 
+    def _eval_array(self, dict: dict):
+        return np.multiply(self.left._eval_array(dict), self.right._eval_array(dict))
+
 class Plus(BinaryOperator):
+    __slots__ = ()
     def eval(self, dict: dict):
         return self.left.eval(dict) + self.right.eval(dict)
 
+    def _eval_array(self, dict: dict):
+        return np.add(self.left._eval_array(dict), self.right._eval_array(dict))
+
 class Minus(BinaryOperator):
+    __slots__ = ()
     def eval(self, dict: dict):
         return self.left.eval(dict) - self.right.eval(dict)
 
+    def _eval_array(self, dict: dict):
+        return np.subtract(self.left._eval_array(dict), self.right._eval_array(dict))
+
 class Expon(BinaryOperator):
+    __slots__ = ()
     def eval(self, dict: dict):
         return self.left.eval(dict) ** self.right.eval(dict)
 
+    def _eval_array(self, dict: dict):
+        return np.power(self.left._eval_array(dict), self.right._eval_array(dict))
+
+class NaryOperator(Atom):
+    """
+    Associative operation of any number of operands. A whole chain of the operation is a single node, so no nested binary
+    nodes are built and walked. The simplifier keeps the operands in canonical sorted order.
+    """
+    __slots__ = ("args",)
+    def __init__(self, args):
+        _setattr(self, "args", tuple(args))
+        self._freeze()
+
+    def _key(self):
+        return self.args
+
+    def children(self):
+        return self.args
+
+    def _intern_children(self):
+        args = tuple([a.intern() for a in self.args])
+        if all([a is b for a, b in zip(args, self.args)]):
+            return self
+        return type(self)(args)
+
+class Sum(NaryOperator):
+    """
+    Sum of terms. Subtraction is a term with a negative coefficient, e.g. a - b is Sum([a, Product([Num(-1), b])]).
+    """
+    __slots__ = ()
+    def eval(self, dict: dict):
+        return sum([a.eval(dict) for a in self.args])
+
+    def _eval_array(self, dict: dict):
+        result = self.args[0]._eval_array(dict)
+        for a in self.args[1:]:
+            result = np.add(result, a._eval_array(dict))
+        return result
+
+class Product(NaryOperator):
+    """
+    Product of factors, the numeric coefficient comes first.
+    """
+    __slots__ = ()
+    def eval(self, dict: dict):
+        result = 1
+        for a in self.args:
+            result = result * a.eval(dict)
+        return result
+
+    def _eval_array(self, dict: dict):
+        result = self.args[0]._eval_array(dict)
+        for a in self.args[1:]:
+            result = np.multiply(result, a._eval_array(dict))
+        return result
+
 class Num(Atom):
+    """
+    Number stored as a native int, an exact fractions.Fraction or a float. Machine integers stay plain ints, so the common case
+    of integer arithmetic costs no more than python ints. Fractions come from exact division and never have denominator 1.
+    Exact numbers and floats of equal value are different numbers, e.g. 2 and 2.0.
+    """
+    __slots__ = ("num",)
     def __init__(self, value):
-        self.value = str(value)
-        self.num = self.convert()
-        self.init_args = (self.value, self)
-
-    def convert(self):
-        return ast.literal_eval(self.value)
+        _setattr(self, "num", self.convert(value))
+        self._freeze()
+
+    def _key(self):
+        return (type(self.num), self.num)
+
+    @property
+    def value(self) -> str:
+        return str(self.num)
+
+    @property
+    def exact(self) -> bool:
+        return type(self.num) is not float
+
+    @staticmethod
+    def convert(value):
+        """
+        Converts text of a number or a python, fractions or numpy number to int, Fraction or float.
+        """
+        if type(value) is int or type(value) is float:
+            return value
+        elif type(value) is Fraction:
+            return value.numerator if value.denominator == 1 else value
+        elif isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                return float(value)
+        elif isinstance(value, (int, np.integer)):
+            return int(value)
+        return float(value)
+
+    @staticmethod
+    def power(base, exponent):
+        """
+        Raises a number to a number, exactly if the base is exact and the exponent is an integer.
+        Returns None if the power is not a real number.
+        """
+        if base == 0 and exponent < 0:
+            return None
+        elif type(exponent) is int:
+            if exponent < 0 and type(base) is not float:
+                return Fraction(base) ** exponent
+            return base ** exponent
+        elif base < 0:
+            return None
+        return float(base) ** float(exponent)
 
     def __eq__(self, other):
         if isinstance(other, Num):
-            return self.value == other.value
-        elif isinstance(other, int) or isinstance(other, float):
+            return type(self.num) is type(other.num) and self.num == other.num
+        elif isinstance(other, (int, float, Fraction)):
             return self.num == other
         else:
             return False
 
+    def __hash__(self):
+        return self._hash
+
     def __add__(self, other):
         if type(other) == Num:
             return Num(self.num+other.num)
@@ -179,17 +410,26 @@ class Num(Atom):
 
     def __pow__(self, other):
         if type(other) == Num:
-            return Num(self.num**other.num)
-        else:
-            return super().__pow__(other)
+            power = Num.power(self.num, other.num)
+            if power is not None:
+                return Num(power)
+        return super().__pow__(other)
 
     def eval(self, dict: dict):
-        return self.num
+        return self.num if type(self.num) is not Fraction else float(self.num)
+
+    def _eval_array(self, dict: dict):
+        # floats avoid numpy errors for integers raised to negative integer powers
+        return np.float64(self.num)
 
 class Var(Atom):
+    __slots__ = ("value",)
     def __init__(self, value):
-        self.value = value
-        self.init_args = (self.value, self)
+        _setattr(self, "value", value)
+        self._freeze()
+
+    def _key(self):
+        return (self.value,)
 
     def eval(self, dict: dict):
         try:
@@ -197,43 +437,83 @@ class Var(Atom):
         except:
             raise Exception(f"Var {self.value} has no specified value.")
 
+    def _eval_array(self, dict: dict):
+        return np.asarray(self.eval(dict), dtype=float)
+
 class Function(Atom):
+    """
+    Function applied to its arguments. Built-in functions declare their name as a class attribute.
+    """
+    __slots__ = ("_name", "args", "func")
     def __init__(self, name, args, func = None):
-        self.name = name
-        if type(args) != list:
-            self.args = [args]
+        _setattr(self, "_name", name)
+        _setattr(self, "args", tuple(args) if isinstance(args, (list, tuple)) else (args,))
+        _setattr(self, "func", func)
+        self._freeze()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _key(self):
+        return (self.name,) + self.args
+
+    def children(self):
+        return self.args
+
+    def _intern_children(self):
+        args = tuple([a.intern() for a in self.args])
+        if all([a is b for a, b in zip(args, self.args)]):
+            return self
+        elif type(self) in BUILT_IN_FUNCTIONS:
+            return type(self)(args)
         else:
-            self.args = args
-        self.func = func
-        self.init_args = (self.name, self.args, self)
+            return type(self)(self.name, args, self.func)
 
     def eval(self, dict: dict):
         args = tuple([a.eval(dict) for a in self.args])
         return self.func(*args)
 
+    def _eval_array(self, dict: dict):
+        if self.func is None:
+            raise Exception(f"Function {self.name} has no specified implementation.")
+        args = tuple([a._eval_array(dict) for a in self.args])
+        if isinstance(self.func, np.ufunc):
+            return self.func(*args)
+        # plain python functions are evaluated point by point
+        return np.vectorize(self.func, otypes=[float])(*args)
+
 class Sin(Function):
+    __slots__ = ()
     name = "sin"
     def __init__(self, args):
         super().__init__(self.name, args, np.sin)
 
 class Cos(Function):
+    __slots__ = ()
     name = "cos"
     def __init__(self, args):
         super().__init__(self.name, args, np.cos)
 
 class Tan(Function):
+    __slots__ = ()
     name = "tan"
     def __init__(self, args):
         super().__init__(self.name, args, np.tan)
 
 class Exp(Function):
+    __slots__ = ()
     name = "exp"
     def __init__(self, args):
         super().__init__(self.name, args, np.exp)
 
 class Ln(Function):
+    __slots__ = ()
     name = "ln"
     def __init__(self, args):
         super().__init__(self.name, args, np.log)
 
-BUILT_IN_FUNCTIONS = [Sin, Cos, Tan, Exp, Ln]
\ No newline at end of file
+BUILT_IN_FUNCTIONS = [Sin, Cos, Tan, Exp, Ln]
+
+# shared instances of interned expressions, entries disappear together with the expressions
+_INTERN_TABLE = weakref.WeakValueDictionary()
\ No newline at end of file
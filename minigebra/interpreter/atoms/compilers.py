@@ -0,0 +1,184 @@
+import numpy as np
+
+from . import atoms as atoms
+
+class CompileError(Exception):
+    "Raised when an error occurs while compiling."
+    pass
+
+class KernelBuilder:
+    """
+    Collects lines of a generated python function. Each node of an expression is lowered to a single assignment into a temporary variable.
+    Identical operations on identical operands are emitted only once.
+    """
+    def __init__(self, vars: list[str]):
+        self.vars = list(vars)
+        self.params = [f"v{i}" for i in range(len(self.vars))]
+        self.lines = []
+        self.namespace = {"_asarray": np.asarray, "_float": np.float64, "_errstate": np.errstate, "_broadcast_to": np.broadcast_to, "_broadcast_shapes": np.broadcast_shapes, "_shape": np.shape}
+        # id of a bound value -> its name, the values are kept alive by the namespace, so their ids stay valid
+        self.bound = {id(value): name for name, value in self.namespace.items()}
+        self.emitted = {}
+        self.nodes = {}
+
+    def emit(self, expr) -> str:
+        """
+        Emits the expression and returns the name which holds its value. Structurally equal subexpressions are emitted only once.
+        """
+        try:
+            return self.nodes[expr]
+        except KeyError:
+            name = expr.get_compiler().emit(expr, self)
+            self.nodes[expr] = name
+            return name
+
+    def var(self, name: str) -> str:
+        """
+        Returns the name of the parameter which holds the variable.
+        """
+        try:
+            return self.params[self.vars.index(name)]
+        except ValueError:
+            raise CompileError(f"Var {name} has no specified value.")
+
+    def bind(self, value, prefix: str = "c") -> str:
+        """
+        Binds a constant or a callable into the namespace of the generated function and returns its local name.
+        """
+        try:
+            return self.bound[id(value)]
+        except KeyError:
+            name = f"_{prefix}{len(self.namespace)}"
+            self.namespace[name] = value
+            self.bound[id(value)] = name
+            return name
+
+    def constant(self, value) -> str:
+        """
+        Binds a number into the namespace of the generated function. Numbers are converted to float64 once here.
+        """
+        key = ("const", float(value))
+        if key not in self.emitted:
+            self.emitted[key] = self.bind(np.float64(value))
+        return self.emitted[key]
+
+    def call(self, func, *args: str) -> str:
+        """
+        Emits a call of func on already emitted operands and returns the name of the temporary variable holding the result.
+        """
+        prefix = getattr(func, "__name__", "")
+        name = self.bind(func, prefix if prefix.isidentifier() else "f")
+        key = (name, args)
+        if key not in self.emitted:
+            temp = f"t{len(self.lines)}"
+            self.lines.append(f"{temp} = {name}({', '.join(args)})")
+            self.emitted[key] = temp
+        return self.emitted[key]
+
+    def source(self, outputs: list[str]) -> str:
+        """
+        Renders the source code of the generated function.
+        """
+        defaults = "".join([f", {name}={name}" for name in self.namespace])
+        params = ", ".join(self.params)
+        body = [f"def kernel({params}{', ' if params else ''}*{defaults}):"]
+        body += [f"    {p} = _asarray({p}, dtype=_float)" for p in self.params]
+        body.append(f"    shape = _broadcast_shapes({''.join([f'_shape({p}), ' for p in self.params])})")
+        body.append("    with _errstate(all='ignore'):")
+        body += [f"        {line}" for line in self.lines] or ["        pass"]
+        results = [f"_broadcast_to({name}, shape).astype(_float)" for name in outputs]
+        body.append(f"    return {results[0] if len(results) == 1 else '(' + ', '.join(results) + ',)'}")
+        return "\n".join(body)
+
+    def build(self, outputs: list[str]) -> callable:
+        """
+        Compiles the generated source into a python function.
+        """
+        namespace = dict(self.namespace)
+        exec(compile(self.source(outputs), "<minigebra-kernel>", "exec"), namespace)
+        return namespace["kernel"]
+
+def compile_kernel(exprs: list, vars: list[str]) -> callable:
+    """
+    Lowers expressions into a single python function which accepts values of vars as positional arrays or scalars.
+    The function returns one float array per expression.
+    """
+    builder = KernelBuilder(vars)
+    outputs = [builder.emit(expr) for expr in exprs]
+    return builder.build(outputs)
+
+class Atom:
+    """
+    Provides functions to lower atomic expressions into generated python code.
+    Compilers are stateless, each function accepts the lowered expression and the builder.
+    """
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        raise CompileError(f"Expression {expr} can not be compiled.")
+
+class Var(Atom):
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        return builder.var(expr.value)
+
+class Num(Atom):
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        return builder.constant(expr.num)
+
+class BinaryOperator(Atom):
+    ufunc = None
+
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        left = builder.emit(expr.left)
+        right = builder.emit(expr.right)
+        return builder.call(self.ufunc, left, right)
+
+class Div(BinaryOperator):
+    ufunc = np.divide
+
+class Mul(BinaryOperator):
+    ufunc = np.multiply
+
+class Plus(BinaryOperator):
+    ufunc = np.add
+
+class Minus(BinaryOperator):
+    ufunc = np.subtract
+
+class Expon(BinaryOperator):
+    ufunc = np.power
+
+class NaryOperator(Atom):
+    ufunc = None
+
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        result = builder.emit(expr.args[0])
+        for arg in expr.args[1:]:
+            result = builder.call(self.ufunc, result, builder.emit(arg))
+        return result
+
+class Sum(NaryOperator):
+    ufunc = np.add
+
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        # terms multiplied by -1 are substracted
+        result = builder.emit(expr.args[0])
+        for arg in expr.args[1:]:
+            if type(arg) == atoms.Product and arg.args[0] == -1:
+                rest = arg.args[1:]
+                result = builder.call(np.subtract, result, builder.emit(rest[0] if len(rest) == 1 else atoms.Product(rest)))
+            else:
+                result = builder.call(np.add, result, builder.emit(arg))
+        return result
+
+class Product(NaryOperator):
+    ufunc = np.multiply
+
+class Function(Atom):
+    def emit(self, expr, builder: KernelBuilder) -> str:
+        func = expr.func
+        if func is None:
+            raise CompileError(f"Function {expr.name} has no specified implementation.")
+        elif not isinstance(func, np.ufunc):
+            # plain python functions are evaluated point by point
+            func = np.vectorize(func, otypes=[float])
+        args = [builder.emit(a) for a in expr.args]
+        return builder.call(func, *args)
@@ -4,139 +4,129 @@ class DifferentiationError(Exception):
     "Raised when an error occurs while differentiating."
     pass
 
+def is_constant(expr) -> bool:
+    """
+    Determines whether the expression contains no variables.
+    """
+    if type(expr) == atoms.Var:
+        return False
+    return all([is_constant(child) for child in expr.children()])
+
 class Atom:
     """
     Provides functions to symbolically differentiate atomic expressions.
+    Differentiators are stateless, each function accepts the differentiated expression.
     """
-    def __init__(self, parent):
-        self.parent = parent
-
-    def diff(self):
-        return self.parent
+    def diff(self, expr):
+        return expr
 
 class Var(Atom):
-    def __init__(self,value, parent):
-        super().__init__(parent)
-        self.value = value
-
-    def diff(self):
+    def diff(self, expr):
         return atoms.Num(1)
 
 class Num(Atom):
-    def __init__(self,value, parent):
-        super().__init__(parent)
-        self.value = value
-
-    def diff(self):
+    def diff(self, expr):
         return atoms.Num(0)
 
 class BinaryOperator(Atom):
-    def __init__(self, left, right, parent):
-        super().__init__(parent)
-        self.left = left
-        self.right = right
+    pass
 
 class Div(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def diff(self):
-        return (self.left.diff() * self.right - self.left * self.right.diff()) / (self.right ** 2)
+    def diff(self, expr):
+        return (expr.left.diff() * expr.right - expr.left * expr.right.diff()) / (expr.right ** 2)
 
 class Mul(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def diff(self):
-        return self.left.diff() * self.right + self.left * self.right.diff()
+    def diff(self, expr):
+        return expr.left.diff() * expr.right + expr.left * expr.right.diff()
 
 class Plus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def diff(self):
-        return self.left.diff() + self.right.diff()
+    def diff(self, expr):
+        return expr.left.diff() + expr.right.diff()
 
 class Minus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def diff(self):
-        return self.left.diff() - self.right.diff()
+    def diff(self, expr):
+        return expr.left.diff() - expr.right.diff()
 
 class Expon(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
+    def diff(self, expr):
+        left = expr.left ; right = expr.right
+        # (u ^ n)' = n * u ^ (n-1) * u'
+        if is_constant(right):
+            return right * left ** (right - 1) * left.diff()
 
-    def diff(self):
-        return atoms.Exp([self.right * atoms.Ln([self.left])]).diff()
+        # (a ^ u)' = a ^ u * ln(a) * u'
+        elif is_constant(left):
+            return expr * atoms.Ln([left]) * right.diff()
 
-class Function(Atom):
-    def __init__(self,name, args, parent):
-        super().__init__(parent)
-        self.name = name
-        self.args = args
+        # u ^ v = exp(v * ln(u))
+        else:
+            return atoms.Exp([right * atoms.Ln([left])]).diff()
+
+class NaryOperator(Atom):
+    pass
+
+class Sum(NaryOperator):
+    def diff(self, expr):
+        return atoms.Sum([arg.diff() for arg in expr.args])
+
+class Product(NaryOperator):
+    def diff(self, expr):
+        # (f1 * f2 * ... * fn)' = f1' * f2 * ... * fn + f1 * f2' * ... * fn + ... + f1 * f2 * ... * fn'
+        terms = []
+        for index, factor in enumerate(expr.args):
+            if type(factor) == atoms.Num:
+                continue
+            terms.append(atoms.Product(expr.args[:index] + (factor.diff(),) + expr.args[index+1:]))
+        if not terms:
+            return atoms.Num(0)
+        return terms[0] if len(terms) == 1 else atoms.Sum(terms)
 
-    def _error_message(self):
-        raise DifferentiationError(f"Function {self.name} only supports single variable differentiating.")
+class Function(Atom):
+    def _error_message(self, expr):
+        raise DifferentiationError(f"Function {expr.name} only supports single variable differentiating.")
 
-    def diff(self):
-        if len(self.args) == 1:
-            return self.parent * self.args[0].diff()
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            return expr * expr.args[0].diff()
         else:
-            self._error_message()
+            self._error_message(expr)
 
 class Sin(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def diff(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            arg = expr.args[0]
             return atoms.Cos([arg]) * arg.diff()
         else:
-            self._error_message()
+            self._error_message(expr)
 
 class Cos(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def diff(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            arg = expr.args[0]
             return atoms.Num(-1) * atoms.Sin([arg]) * arg.diff()
         else:
-            self._error_message()
+            self._error_message(expr)
 
 class Tan(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def diff(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
-            return atoms.Num(1) / (atoms.Cos(self.args)*atoms.Cos(self.args)) * arg.diff()
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            arg = expr.args[0]
+            return atoms.Num(1) / (atoms.Cos(expr.args)*atoms.Cos(expr.args)) * arg.diff()
         else:
-            self._error_message()
+            self._error_message(expr)
 
 class Exp(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def diff(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            arg = expr.args[0]
             return atoms.Exp(arg) * arg.diff()
         else:
-            self._error_message()
+            self._error_message(expr)
 
 class Ln(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def diff(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
+    def diff(self, expr):
+        if len(expr.args) == 1:
+            arg = expr.args[0]
             return atoms.Num(1) / arg * arg.diff()
         else:
-            self._error_message()
+            self._error_message(expr)
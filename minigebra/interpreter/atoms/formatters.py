@@ -1,224 +1,277 @@
+"""
+Formatters turn atomic expressions to string or latex format. A formatter lists the parts of its node: strings, and child nodes
+tagged with the format in which they are rendered. render() walks the tree iteratively, so deep trees do not hit the recursion limit.
+The rendered form of every node is cached on the node, nodes are immutable.
+"""
+from fractions import Fraction
+
 from . import atoms as atoms
 
+# format -> slot of a node which caches its rendered form
+CACHES = {"text": "_text", "latex": "_latex"}
+
+def text(expr) -> tuple:
+    """
+    Part which renders the expression as plain text.
+    """
+    return (expr, "text")
+
+def latex(expr) -> tuple:
+    """
+    Part which renders the expression as latex.
+    """
+    return (expr, "latex")
+
+def render(expr, format: str = "text") -> str:
+    """
+    Renders the expression in the format ("text" or "latex"). Every rendered node caches its result, so subtrees shared
+    by several expressions, e.g. by derivatives of different orders, are rendered only once.
+    """
+    cached = getattr(expr, CACHES[format], None)
+    if cached is not None:
+        return cached
+
+    out = []
+    stack = [(expr, format)]
+    while stack:
+        part = stack.pop()
+        if type(part) is str:
+            out.append(part)
+        elif len(part) == 3:
+            # all parts of the node were written from start, they are joined and cached on the node
+            node, part_format, start = part
+            result = "".join(out[start:])
+            atoms._setattr(node, CACHES[part_format], result)
+            out[start:] = [result]
+        else:
+            node, part_format = part
+            cached = getattr(node, CACHES[part_format], None)
+            if cached is not None:
+                out.append(cached)
+            else:
+                stack.append((node, part_format, len(out)))
+                stack.extend(reversed(node.get_formatter().parts(node, part_format)))
+    return out[0]
+
+def _brackets(part: tuple, condition: bool) -> list:
+    return ["(", part, ")"] if condition else [part]
+
+def _is_operator(expr) -> bool:
+    return isinstance(expr, (atoms.BinaryOperator, atoms.NaryOperator))
+
+def _is_fraction(expr) -> bool:
+    """
+    Determines whether the expression is a number written as a fraction, which is bracketed like a division.
+    """
+    return type(expr) == atoms.Num and type(expr.num) == Fraction
+
+def _negated(term):
+    """
+    Returns the term with the opposite sign if the term has a negative coefficient, otherwise None. Such terms are substracted in sums.
+    """
+    if type(term) == atoms.Num and term.num < 0:
+        return atoms.Num(-term.num)
+    elif type(term) == atoms.Product and type(term.args[0]) == atoms.Num and term.args[0].num < 0:
+        rest = term.args[1:]
+        if term.args[0] != -1:
+            return atoms.Product((atoms.Num(-term.args[0].num),) + rest)
+        return rest[0] if len(rest) == 1 else atoms.Product(rest)
+    return None
+
 class Atom:
     """
     Provides functions to turn atomic expressions to string or latex format.
+    Formatters are stateless, each function accepts the formatted expression.
     """
-    def __init__(self, parent):
-        self.parent = parent
+    def parts(self, expr, format: str) -> list:
+        if format == "latex":
+            return self.latex_parts(expr)
+        return self.string_parts(expr)
 
-    def string_format(self):
-        return "atom"
+    def string_parts(self, expr) -> list:
+        return ["atom"]
 
-    def latex_format(self):
-        return self.string_format()
+    def latex_parts(self, expr) -> list:
+        return self.string_parts(expr)
 
-    def mathjax_format1(self):
-        return "$" + self.latex_format() + "$"
+    def string_format(self, expr):
+        return render(expr, "text")
 
-    def mathjax_format2(self):
-        return "$$" + self.latex_format() + "$$"
+    def latex_format(self, expr):
+        return render(expr, "latex")
 
-class Var(Atom):
-    def __init__(self, value, parent):
-        super().__init__(parent)
-        self.value = value
+    def mathjax_format1(self, expr):
+        return "$" + self.latex_format(expr) + "$"
+
+    def mathjax_format2(self, expr):
+        return "$$" + self.latex_format(expr) + "$$"
 
-    def string_format(self):
-        return f"{self.value}"
+class Var(Atom):
+    def string_parts(self, expr):
+        return [f"{expr.value}"]
 
 class Num(Atom):
-    def __init__(self, value, parent):
-        super().__init__(parent)
-        self.value = value
+    def string_parts(self, expr):
+        if type(expr.num) == Fraction:
+            return [f"{expr.num.numerator} / {expr.num.denominator}"]
+        return [f"{expr.num}"]
 
-    def string_format(self):
-        return f"{self.value}"
+    def latex_parts(self, expr):
+        if type(expr.num) == Fraction:
+            sign = "-" if expr.num < 0 else ""
+            return [sign + r"\frac{" + f"{abs(expr.num.numerator)}" + "}{" + f"{expr.num.denominator}" + "}"]
+        return self.string_parts(expr)
 
 class BinaryOperator(Atom):
-    def __init__(self, left, right, parent):
-        super().__init__(parent)
-        self.left = left
-        self.right = right
-
-    def string_format(self):
-        return f"operator({self.left},{self.right})"
+    def string_parts(self, expr):
+        return ["operator(", text(expr.left), ",", text(expr.right), ")"]
 
 class Div(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def string_format(self):
-        left, right = self.__correct_bracket(self.left, self.right)
-        return f"{left} / {right}"
-
-    def latex_format(self):
-        left, right = self.__correct_bracket(self.left.print("latex"), self.right.print("latex"))
-        return r"\frac{" + str(left) + "}{" + str(right) + "}"
+    bracket_types = None
 
-    def __correct_bracket(self, left, right):
-        bracket_types = [atoms.Plus, atoms.Minus, atoms.Div, atoms.Expon]
-        if type(self.left) in bracket_types:
-            left = f"({left})"
+    def string_parts(self, expr):
+        left, right = self.__correct_bracket(expr, text(expr.left), text(expr.right))
+        return left + [" / "] + right
 
-        if type(self.right) in bracket_types:
-            right = f"({right})"
+    def latex_parts(self, expr):
+        left, right = self.__correct_bracket(expr, latex(expr.left), latex(expr.right))
+        return [r"\frac{"] + left + ["}{"] + right + ["}"]
 
+    def __correct_bracket(self, expr, left, right):
+        bracket_types = [atoms.Plus, atoms.Minus, atoms.Sum, atoms.Div, atoms.Expon]
+        left = _brackets(left, type(expr.left) in bracket_types or _is_fraction(expr.left))
+        right = _brackets(right, type(expr.right) in bracket_types + [atoms.Product] or _is_fraction(expr.right))
         return left, right
 
+class Mul(BinaryOperator):
+    def string_parts(self, expr):
+        return self.__parts(expr, text, " * ")
 
+    def latex_parts(self, expr):
+        return self.__parts(expr, latex, r" \cdot ")
 
-class Mul(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def string_format(self):
-        left = self.left ; right = self.right
-        left = self.left ; right = self.right
-        bracket_types = [atoms.Plus, atoms.Minus, atoms.Expon, atoms.Div]
+    def __parts(self, expr, format: callable, times: str):
+        left = expr.left ; right = expr.right
+        bracket_types = [atoms.Plus, atoms.Minus, atoms.Expon, atoms.Div, atoms.Sum, atoms.Product]
         neglect_types = [atoms.Function, atoms.Var, atoms.Num, *atoms.BUILT_IN_FUNCTIONS]
         if type(left) == atoms.Num and type(right) == atoms.Num:
             if left.num < 0:
-                return f"({left} * {right})"
+                return ["(", format(left), times, format(right), ")"]
             else:
-                return f"{left} * {right}"
+                return [format(left), times, format(right)]
 
-        if type(left) in neglect_types and type(right) in neglect_types:
+        if type(left) in neglect_types and type(right) in neglect_types and not _is_fraction(left) and not _is_fraction(right):
             if type(left) == atoms.Num and left.num < 0:
-                return f"({self.left}{self.right})"
+                return ["(", format(left), format(right), ")"]
             elif type(right) == atoms.Num and right.num < 0:
-                return f"({self.right}{self.left})"
-            else:
-                return f"{self.left}{self.right}"
-
-        if type(left) in bracket_types:
-            left = f"({left})"
-
-        if type(right) in bracket_types:
-            right = f"({right})"
-
-        return f"{left}{right}"
-
-    def latex_format(self):
-        left = self.left.print("latex") ; right = self.right.print("latex")
-        bracket_types = [atoms.Plus, atoms.Minus, atoms.Expon, atoms.Div]
-        neglect_types = [atoms.Function, atoms.Var, atoms.Num, *atoms.BUILT_IN_FUNCTIONS]
-        if type(self.left) == atoms.Num and type(self.right) == atoms.Num:
-            if self.left.num < 0:
-                return f"({left}"+ r" \cdot " +  f"{right})"
-            else:
-                return f"{left}"+ r" \cdot " +  f"{right}"
-
-        if type(self.left) in neglect_types and type(self.right) in neglect_types:
-            if type(self.left) == atoms.Num and self.left.num < 0:
-                return f"({left}{right})"
-            elif type(self.right) == atoms.Num and self.right.num < 0:
-                return f"({right}{left})"
+                return ["(", format(right), format(left), ")"]
             else:
-                return f"{left}{right}"
-
-        if type(self.left) in bracket_types:
-            left = f"({left})"
-
-        if type(self.right) in bracket_types:
-            right = f"({right})"
+                return [format(left), format(right)]
 
-        return f"{left}{right}"
+        left = _brackets(format(left), type(left) in bracket_types or _is_fraction(left))
+        right = _brackets(format(right), type(right) in bracket_types or _is_fraction(right))
+        return left + right
 
-        
 class Plus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def string_format(self):
-        return f"{self.left} + {self.right}"
+    def string_parts(self, expr):
+        return [text(expr.left), " + ", text(expr.right)]
 
-    def latex_format(self):
-        return f"{self.left.print('latex')} + {self.right.print('latex')}"
+    def latex_parts(self, expr):
+        return [latex(expr.left), " + ", latex(expr.right)]
 
 class Minus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def string_format(self):
-        return f"{self.left} - {self.right}"
+    def string_parts(self, expr):
+        return [text(expr.left), " - ", text(expr.right)]
 
-    def latex_format(self):
-        return f"{self.left.print('latex')} - {self.right.print('latex')}"
+    def latex_parts(self, expr):
+        return [latex(expr.left), " - ", latex(expr.right)]
 
 class Expon(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def string_format(self):
-        left = str(self.left)
-        right = str(self.right)
-        if isinstance(self.right, atoms.BinaryOperator):
-            right = f"({self.right})"
-
-        if isinstance(self.left, atoms.BinaryOperator):
-            left = f"({self.left})"
-
-        return f"{left} ^ {right}"
-
-    def latex_format(self):
-        left = self.left.print('latex')
-        right = self.right.print('latex')
-        if isinstance(self.right, atoms.BinaryOperator):
-            right = f"({self.right})"
-
-        if isinstance(self.left, atoms.BinaryOperator):
-            left = f"({self.left})"
-
-        return f"{left}" +  r"^{" f"{right}" + "}"
+    def string_parts(self, expr):
+        left = _brackets(text(expr.left), _is_operator(expr.left) or _is_fraction(expr.left))
+        right = _brackets(text(expr.right), _is_operator(expr.right) or _is_fraction(expr.right))
+        return left + [" ^ "] + right
+
+    def latex_parts(self, expr):
+        # operators in brackets are rendered as plain text
+        left = ["(", text(expr.left), ")"] if _is_operator(expr.left) or _is_fraction(expr.left) else [latex(expr.left)]
+        right = ["(", text(expr.right), ")"] if _is_operator(expr.right) or _is_fraction(expr.right) else [latex(expr.right)]
+        return left + ["^{"] + right + ["}"]
+
+class NaryOperator(Atom):
+    def string_parts(self, expr):
+        parts = ["operator("]
+        for index, arg in enumerate(expr.args):
+            parts += [text(arg)] if index == 0 else [",", text(arg)]
+        return parts + [")"]
+
+class Sum(NaryOperator):
+    def string_parts(self, expr):
+        return self.__parts(expr, text)
+
+    def latex_parts(self, expr):
+        return self.__parts(expr, latex)
+
+    def __parts(self, expr, format: callable):
+        parts = [format(expr.args[0])]
+        for term in expr.args[1:]:
+            negated = _negated(term)
+            if negated is None:
+                parts += [" + ", format(term)]
+            else:
+                parts += [" - "] + _brackets(format(negated), type(negated) in [atoms.Plus, atoms.Minus, atoms.Sum])
+        return parts
+
+class Product(NaryOperator):
+    def string_parts(self, expr):
+        return self.__parts(expr, text, " * ")
+
+    def latex_parts(self, expr):
+        return self.__parts(expr, latex, r" \cdot ")
+
+    def __parts(self, expr, format: callable, times: str):
+        bracket_types = [atoms.Plus, atoms.Minus, atoms.Expon, atoms.Div, atoms.Sum, atoms.Product]
+        factors = expr.args
+        parts = []
+        if len(factors) > 1 and factors[0] == -1:
+            parts.append("-")
+            factors = factors[1:]
+        for index, factor in enumerate(factors):
+            if index > 0 and type(factor) == atoms.Num:
+                # a number is never written right after another factor
+                parts.append(times)
+            parts += _brackets(format(factor), type(factor) in bracket_types or (_is_fraction(factor) and format is text))
+        return parts
 
 class Function(Atom):
-    def __init__(self, name, args, parent):
-        super().__init__(parent)
-        self.name = name
-        self.args = args
+    def string_parts(self, expr):
+        return [f"{expr.name}("] + self._args_parts(expr, text) + [")"]
 
-    def string_format(self):
-        return f"{self.name}({self.__string_args_format()})"
+    def _args_parts(self, expr, format: callable) -> list:
+        parts = [format(expr.args[0])]
+        for arg in expr.args[1:]:
+            parts += [", ", format(arg)]
+        return parts
 
-    def __string_args_format(self):
-        return str(self.args[0]) + "".join([f", {str(arg)}" for arg in self.args[1:]])
-
-    def _latex_args_format(self):
-        first = self.args[0].print("latex")
-        return "(" + first + r"".join([f", {arg.print('latex')}" for arg in self.args[1:]]) + ")"
+    def _latex_args_parts(self, expr) -> list:
+        return ["("] + self._args_parts(expr, latex) + [")"]
 
 class Sin(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def latex_format(self):
-        return r"\sin{" + self._latex_args_format() + "}"
+    def latex_parts(self, expr):
+        return [r"\sin{"] + self._latex_args_parts(expr) + ["}"]
 
 class Cos(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def latex_format(self):
-        return r"\cos{" + self._latex_args_format() + "}"
+    def latex_parts(self, expr):
+        return [r"\cos{"] + self._latex_args_parts(expr) + ["}"]
 
 class Tan(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def latex_format(self):
-        return r"\tan{" + self._latex_args_format() + "}"
+    def latex_parts(self, expr):
+        return [r"\tan{"] + self._latex_args_parts(expr) + ["}"]
 
 class Exp(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def latex_format(self):
-        return r"e^{" + self._latex_args_format() + "}"
+    def latex_parts(self, expr):
+        return [r"e^{"] + self._latex_args_parts(expr) + ["}"]
 
 class Ln(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def latex_format(self):
-        return r"\ln{" + self._latex_args_format() + "}"
\ No newline at end of file
+    def latex_parts(self, expr):
+        return [r"\ln{"] + self._latex_args_parts(expr) + ["}"]
@@ -0,0 +1,199 @@
+"""
+Sparse canonical form of sums and products of atomic expressions. A polynomial is a dict from monomials to coefficients.
+A monomial is a sorted tuple of (factor, exponent) pairs, where a factor is a variable or an opaque expression which is not a polynomial,
+e.g. a function call, a fraction or a sum in a product of several sums. Exponents are integers, negative exponents make rational terms.
+Like terms share their monomial, so collecting them is a single dict lookup instead of trying to combine every pair of terms.
+"""
+from fractions import Fraction
+
+from . import atoms as atoms
+
+class Polynomial:
+    """
+    Sparse polynomial with python numbers as coefficients. Terms with zero coefficient are never stored.
+    """
+    __slots__ = ("terms",)
+
+    def __init__(self, terms: dict = None):
+        self.terms = {} if terms is None else terms
+
+    @classmethod
+    def constant(cls, value) -> "Polynomial":
+        return cls({(): value} if value != 0 else {})
+
+    @classmethod
+    def factor(cls, expr, exponent: int = 1) -> "Polynomial":
+        return cls({((expr, exponent),): 1})
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def add(self, other: "Polynomial", scale = 1) -> None:
+        """
+        Adds scale * other to the polynomial in place.
+        """
+        for monomial, coefficient in other.terms.items():
+            _add_term(self.terms, monomial, scale * coefficient)
+
+    def __pow__(self, exponent: int) -> "Polynomial":
+        """
+        Raises the polynomial to an integer power. Only single terms are expanded, with negative exponents only if the coefficient is exact,
+        so the coefficients stay exact. A sum raised to a power becomes an opaque factor.
+        """
+        if exponent == 0:
+            return Polynomial.constant(1)
+        elif len(self) == 1:
+            (monomial, coefficient), = self.terms.items()
+            if not monomial:
+                return Polynomial.constant(atoms.Num.power(coefficient, exponent))
+            elif exponent > 0 or type(coefficient) is not float:
+                monomial = tuple([(factor, power * exponent) for factor, power in monomial])
+                return Polynomial({monomial: atoms.Num.power(coefficient, exponent)})
+        return Polynomial.factor(self.to_expr(), exponent)
+
+    def to_expr(self):
+        """
+        Converts the polynomial back to an expression, a Sum of terms ordered by descending degree.
+        """
+        if not self.terms:
+            return atoms.Num(0)
+        terms = list(self.terms.items())
+        if len(terms) > 1:
+            terms.sort(key=lambda term: _monomial_order(term[0]))
+        terms = [_term_expr(monomial, coefficient) for monomial, coefficient in terms]
+        return terms[0] if len(terms) == 1 else atoms.Sum(terms)
+
+def is_chain(expr) -> bool:
+    """
+    Determines whether the expression is a sum or a product, binary or n-ary, or a division by an exact number,
+    which is converted to a polynomial.
+    """
+    return type(expr) in (atoms.Plus, atoms.Minus, atoms.Sum, atoms.Mul, atoms.Product) or _is_exact_division(expr)
+
+def _is_exact_division(expr) -> bool:
+    return type(expr) == atoms.Div and type(expr.right) == atoms.Num and expr.right.exact and expr.right != 0
+
+def _add_term(terms: dict, monomial: tuple, coefficient) -> None:
+    coefficient = terms.get(monomial, 0) + coefficient
+    if coefficient == 0:
+        terms.pop(monomial, None)
+    else:
+        terms[monomial] = coefficient
+
+def _add_powers(powers: dict, monomial: tuple) -> None:
+    for factor, exponent in monomial:
+        exponent += powers.get(factor, 0)
+        if exponent == 0:
+            del powers[factor]
+        else:
+            powers[factor] = exponent
+
+def _to_monomial(powers: dict) -> tuple:
+    if len(powers) < 2:
+        return tuple(powers.items())
+    return tuple(sorted(powers.items(), key=_factor_order))
+
+def _factor_order(item: tuple) -> tuple:
+    factor, exponent = item
+    return (str(factor), exponent)
+
+def _monomial_order(monomial: tuple) -> tuple:
+    return (-sum([exponent for _, exponent in monomial]), [_factor_order(item) for item in monomial])
+
+def _term_expr(monomial: tuple, coefficient):
+    """
+    Builds the Product of the coefficient and the factors. The coefficient comes first and powers last.
+    """
+    factors = [factor if exponent == 1 else atoms.Expon(factor, atoms.Num(exponent)) for factor, exponent in monomial]
+    factors.sort(key=lambda factor: type(factor) == atoms.Expon)
+    if coefficient != 1 or not factors:
+        factors.insert(0, atoms.Num(coefficient))
+    return factors[0] if len(factors) == 1 else atoms.Product(factors)
+
+def _chain(expr, binary: tuple, nary: type) -> list:
+    """
+    Returns the operands of a chain of the binary operations and the n-ary operation, from left to right, together with their signs.
+    Minus negates its right operand.
+    """
+    operands = []
+    stack = [(expr, 1)]
+    while stack:
+        node, sign = stack.pop()
+        kind = type(node)
+        if kind in binary:
+            stack.append((node.right, -sign if kind == atoms.Minus else sign))
+            stack.append((node.left, sign))
+        elif kind == nary:
+            stack.extend([(arg, sign) for arg in reversed(node.args)])
+        else:
+            operands.append((node, sign))
+    return operands
+
+def _sum(expr, simplify: callable) -> Polynomial:
+    result = Polynomial()
+    for operand, sign in _chain(expr, (atoms.Plus, atoms.Minus), atoms.Sum):
+        result.add(from_expr(operand, simplify), sign)
+    return result
+
+def _product(expr, simplify: callable) -> Polynomial:
+    """
+    Multiplies the single terms of a product chain into one term, which is distributed over a single sum.
+    Products of several sums stay factored, the sums become opaque factors.
+    """
+    coefficient = 1
+    powers = {}
+    sums = []
+    for operand, _ in _chain(expr, (atoms.Mul,), atoms.Product):
+        polynomial = from_expr(operand, simplify)
+        if len(polynomial) == 0:
+            return polynomial
+        elif len(polynomial) == 1:
+            (monomial, value), = polynomial.terms.items()
+            coefficient *= value
+            _add_powers(powers, monomial)
+        else:
+            sums.append(polynomial)
+
+    if len(sums) > 1:
+        for polynomial in sums:
+            _add_powers(powers, ((polynomial.to_expr(), 1),))
+        sums = []
+    if not sums:
+        return Polynomial({_to_monomial(powers): coefficient})
+
+    result = Polynomial()
+    for monomial, value in sums[0].terms.items():
+        term = dict(powers)
+        _add_powers(term, monomial)
+        _add_term(result.terms, _to_monomial(term), coefficient * value)
+    return result
+
+def from_expr(expr, simplify: callable = None) -> Polynomial:
+    """
+    Converts sums, products, divisions by exact numbers and integer powers into a polynomial. Other expressions become opaque factors.
+    If simplify is given, the opaque factors are simplified with it before they are converted.
+    """
+    kind = type(expr)
+    if kind == atoms.Num:
+        return Polynomial.constant(expr.num)
+    elif kind == atoms.Plus or kind == atoms.Minus or kind == atoms.Sum:
+        return _sum(expr, simplify)
+    elif kind == atoms.Mul or kind == atoms.Product:
+        return _product(expr, simplify)
+    elif _is_exact_division(expr):
+        # division by an exact number is multiplication by an exact coefficient
+        result = Polynomial()
+        result.add(from_expr(expr.left, simplify), Fraction(1, expr.right.num))
+        return result
+    elif kind == atoms.Expon and type(expr.right) == atoms.Num and type(expr.right.num) == int:
+        return from_expr(expr.left, simplify) ** expr.right.num
+    elif simplify is not None:
+        # the simplified factor may be a sum or a product again, its own factors are already simplified
+        return from_expr(simplify(expr))
+    return Polynomial.factor(expr)
+
+def collect(expr, simplify: callable = None):
+    """
+    Collects like terms of the expression by converting it to its canonical polynomial form and back.
+    """
+    return from_expr(expr, simplify).to_expr()
@@ -0,0 +1,127 @@
+from collections import Counter
+
+class Rule:
+    """
+    Represents a single rewrite rule of the simplifier.
+    The rule applies to nodes whose type is named root and whose children match the patterns in children.
+    A pattern is a type name, a tuple of type names or None, which matches any child.
+    """
+    def __init__(self, name: str, root: str, children: tuple, rewrite: callable, when: callable = None):
+        self.name = name
+        self.root = root
+        self.children = children
+        self.rewrite = rewrite
+        self.when = when
+
+    def __repr__(self) -> str:
+        return f"{self.name}: {self.root}({', '.join([str(i) for i in self.children])})"
+
+    def matches(self, signature: tuple) -> bool:
+        """
+        Determines whether the rule can apply to nodes with the signature (root type name, child type names).
+        """
+        root, children = signature
+        if root != self.root or len(children) != len(self.children):
+            return False
+        for pattern, child in zip(self.children, children):
+            if pattern is None:
+                continue
+            elif isinstance(pattern, tuple):
+                if child not in pattern:
+                    return False
+            elif child != pattern:
+                return False
+        return True
+
+    def apply(self, node):
+        """
+        Rewrites the node. Returns None if the additional condition of the rule does not hold.
+        """
+        if self.when is None or self.when(node):
+            return self.rewrite(node)
+        return None
+
+class RuleEngine:
+    """
+    Holds rewrite rules indexed by the type of a node and the types of its children.
+    Each node only tries the rules that can match its signature, in the order in which the rules were declared.
+    Nodes of the associative and commutative chains, e.g. Sum and Product, also try the rules of two operands on every pair of their operands,
+    so a rule written for a sum of two terms applies to any two terms of a longer sum.
+    The engine counts how many times each rule fired.
+    """
+    def __init__(self, chains: tuple[str] = ()):
+        self.rules: list[Rule] = []
+        self.chains = chains
+        self.fired = Counter()
+        self.__index = {}
+
+    def rule(self, root: str, *children, when: callable = None) -> callable:
+        """
+        Decorator which declares the decorated function as a rewrite rule. The function accepts the matched node and returns its rewritten form.
+        """
+        def decorator(func: callable) -> callable:
+            self.rules.append(Rule(func.__name__, root, children, func, when))
+            self.__index = {}
+            return func
+        return decorator
+
+    def signature(self, node) -> tuple:
+        """
+        Returns the type name of the node together with the type names of its children.
+        """
+        return (type(node).__name__, tuple([type(child).__name__ for child in node.children()]))
+
+    def candidates(self, node) -> list[Rule]:
+        """
+        Returns the rules which can match the node. The selection is computed once per signature.
+        """
+        return self.__candidates(self.signature(node))
+
+    def __candidates(self, signature: tuple) -> list[Rule]:
+        try:
+            return self.__index[signature]
+        except KeyError:
+            rules = [rule for rule in self.rules if rule.matches(signature)]
+            self.__index[signature] = rules
+            return rules
+
+    def __apply(self, rules: list[Rule], node):
+        for rule in rules:
+            result = rule.apply(node)
+            if result is not None:
+                self.fired[rule.name] += 1
+                return result
+        return None
+
+    def rewrite(self, node):
+        """
+        Applies the first rule which matches the node. Returns None if no rule matches.
+        """
+        result = self.__apply(self.candidates(node), node)
+        if result is None and type(node).__name__ in self.chains and len(node.args) > 2:
+            result = self.__rewrite_pair(node)
+        return result
+
+    def __rewrite_pair(self, node):
+        """
+        Applies the first rule which matches a chain of two of the operands, in their order in the chain.
+        The rewritten pair takes the place of the first operand, the other operands are kept.
+        """
+        args = node.args
+        root = type(node).__name__
+        names = [type(arg).__name__ for arg in args]
+        for i in range(len(args)):
+            for j in range(i + 1, len(args)):
+                rules = self.__candidates((root, (names[i], names[j])))
+                if not rules:
+                    continue
+                result = self.__apply(rules, type(node)((args[i], args[j])))
+                if result is not None:
+                    return type(node)(args[:i] + (result,) + args[i+1:j] + args[j+1:])
+        return None
+
+    def reset_statistics(self) -> None:
+        """
+        Forgets which rules fired.
+        """
+        self.fired.clear()
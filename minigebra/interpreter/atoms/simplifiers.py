@@ -1,346 +1,241 @@
+"""
+Simplification rules of atomic expressions. Each rule is declared by the type of the node it rewrites and the types of the node's children,
+so a node only tries the rules that can match it. Expressions are simplified bottom-up, so the rules can assume that the children of the node
+are already simplified.
+"""
+
 from . import atoms as atoms
-from numpy import gcd
+from .rules import RuleEngine
+from . import polynomials
+from ..profiler import profiler
+from contextlib import contextmanager
+from fractions import Fraction
+import threading
+
+engine = RuleEngine(chains=("Sum", "Product"))
+rule = engine.rule
+
+# cancellation flag of the simplifications running in each thread, see cancellable
+_state = threading.local()
+
+class Cancelled(Exception):
+    """
+    Raised when the simplification is interrupted by the cancellation flag.
+    """
+
+@contextmanager
+def cancellable(flag):
+    """
+    Interrupts the simplifications of the current thread with Cancelled once the flag is set.
+    The flag has the method is_set(), e.g. threading.Event.
+    """
+    previous = getattr(_state, "cancellation", None)
+    _state.cancellation = flag
+    try:
+        yield
+    finally:
+        _state.cancellation = previous
+
+def _is_single_arg(expr) -> bool:
+    return len(expr.args) == 1
+
+def _is_negated_logarithm(expr) -> bool:
+    return len(expr.args) == 2 and expr.args[0] == -1 and type(expr.args[1]) == atoms.Ln and _is_single_arg(expr.args[1])
+
+def _logarithm_factor(product):
+    """
+    Returns the position of the first logarithm of a single argument among the factors of the product, or None.
+    The canonical form orders the factors by their text, so the logarithm may be any factor.
+    """
+    for index, factor in enumerate(product.args):
+        if type(factor) == atoms.Ln and _is_single_arg(factor):
+            return index
+    return None
+
+# Div
+
+# 0 / expr = 0
+@rule("Div", "Num", None, when=lambda e: e.left == 0)
+def div_zero_numerator(e):
+    return atoms.Num(0)
+
+# expr / 1 = expr
+@rule("Div", None, "Num", when=lambda e: e.right == 1)
+def div_by_one(e):
+    return e.left
+
+# a / b = c, exact for integers and fractions
+@rule("Div", "Num", "Num", when=lambda e: e.left.exact and e.right.exact and e.right != 0)
+def div_fold_exact(e):
+    return atoms.Num(Fraction(e.left.num, e.right.num))
+
+# Product and Sum
+# numbers, like terms and integer powers are collected by the polynomial form, the rules cover what it treats as opaque factors
+# the rules are written for two operands, the engine applies them to every pair of operands of a longer chain
+
+# a/b * c/d = (a*c)/(b*d)
+@rule("Product", "Div", "Div")
+def product_fractions(e):
+    a = e.args[0].left ; b = e.args[0].right
+    c = e.args[1].left ; d = e.args[1].right
+    return (a * c) / (b * d)
+
+# a * (b/c) = (a*b)/c
+@rule("Product", "Num", "Div", when=lambda e: type(e.args[1].left) == atoms.Num)
+def product_constant_into_fraction(e):
+    a = e.args[0] ; b = e.args[1].left ; c = e.args[1].right
+    return (a*b) / c
+
+# expr ^ a * expr ^ b = expr ^ (a+b)
+@rule("Product", "Expon", "Expon", when=lambda e: type(e.args[0].right) == atoms.Num == type(e.args[1].right) and e.args[0].left == e.args[1].left)
+def product_powers_same_base(e):
+    expr = e.args[0].left
+    a = e.args[0].right ; b = e.args[1].right
+    return expr ** (a + b)
+
+# expr * expr ^ a = expr ^ (a+1)
+@rule("Product", None, "Expon", when=lambda e: e.args[0] == e.args[1].left)
+def product_raise_power(e):
+    expr = e.args[0]
+    a = e.args[1].right
+    return expr ** (a + 1)
+
+# (a/x)(x^b) = ax^(b-1)
+@rule("Product", "Div", "Expon", when=lambda e: e.args[0].right == e.args[1].left and type(e.args[1].right) == atoms.Num)
+def product_fraction_by_power(e):
+    a = e.args[0].left
+    x = e.args[0].right
+    b = e.args[1].right
+    return a * (x ** (b - 1))
+
+# ln a + ln b = ln (a*b)
+@rule("Sum", "Ln", "Ln", when=lambda e: _is_single_arg(e.args[0]) and _is_single_arg(e.args[1]))
+def sum_logarithms(e):
+    return atoms.Ln(e.args[0].args[0] * e.args[1].args[0])
+
+# ln a - ln b = ln (a/b)
+@rule("Sum", "Ln", "Product", when=lambda e: _is_single_arg(e.args[0]) and _is_negated_logarithm(e.args[1]))
+def sum_logarithms_difference(e):
+    return atoms.Ln(e.args[0].args[0] / e.args[1].args[1].args[0])
+
+# -ln b + ln a = ln (a/b)
+@rule("Sum", "Product", "Ln", when=lambda e: _is_negated_logarithm(e.args[0]) and _is_single_arg(e.args[1]))
+def sum_logarithms_difference_reversed(e):
+    return atoms.Ln(e.args[1].args[0] / e.args[0].args[1].args[0])
+
+# Expon
+
+# expr ^ 1 = expr
+@rule("Expon", None, "Num", when=lambda e: e.right == 1)
+def expon_one(e):
+    return e.left
+
+# expr ^ 0 = 1
+@rule("Expon", None, "Num", when=lambda e: e.right == 0)
+def expon_zero(e):
+    return atoms.Num(1)
+
+# ((x ^ a) ^ b) = x ^ (a*b)
+@rule("Expon", "Expon", "Num", when=lambda e: type(e.left.right) == atoms.Num)
+def expon_of_power(e):
+    return e.left.left ** (e.left.right * e.right)
+
+# a ^ b = c
+@rule("Expon", "Num", "Num", when=lambda e: atoms.Num.power(e.left.num, e.right.num) is not None)
+def expon_fold_constants(e):
+    return e.left ** e.right
+
+# Functions
+
+# exp(a * ln b) = b ^ a
+@rule("Exp", "Product", when=lambda e: _logarithm_factor(e.args[0]) is not None)
+def exp_of_logarithm(e):
+    factors = e.args[0].args
+    index = _logarithm_factor(e.args[0])
+    rest = factors[:index] + factors[index+1:]
+    return atoms.Expon(factors[index].args[0], rest[0] if len(rest) == 1 else atoms.Product(rest))
+
+# ln a^b = b * ln a
+@rule("Ln", "Expon")
+def ln_of_power(e):
+    arg = e.args[0]
+    return arg.right * atoms.Ln([arg.left])
+
+def rebuild(expr, children: list):
+    """
+    Creates an expression of the same type with new children. The expression itself is returned if the children did not change.
+    """
+    if all([a is b for a, b in zip(children, expr.children())]):
+        return expr
+    elif isinstance(expr, atoms.BinaryOperator):
+        return type(expr)(*children)
+    elif isinstance(expr, atoms.NaryOperator):
+        return type(expr)(children)
+    elif type(expr) in atoms.BUILT_IN_FUNCTIONS:
+        return type(expr)(children)
+    else:
+        return type(expr)(expr.name, children, expr.func)
+
+def simplify_expr(expr):
+    """
+    Applies the first matching rule to the expression. Returns the expression itself if no rule matches.
+    """
+    result = engine.rewrite(expr)
+    if result is None:
+        return expr
+    return result
+
+def _rewrite_product(term):
+    """
+    Applies the rules of products to a term of a collected sum. The factors of the term are already simplified.
+    """
+    result = engine.rewrite(term) if type(term) == atoms.Product else None
+    return term if result is None else simplify(result)
+
+def _memoize(expr, simplified) -> None:
+    # nodes are immutable, so the normal form is stored next to the structure of the node
+    object.__setattr__(expr, "_simplified", simplified)
 
-class Atom:
+def simplify(expr):
     """
-    This class provides functions to simplify atomic expressions.
+    Simplifies the expression to its normal form. Children are simplified first, then the rules are applied to the node until none matches.
+    Sums and products are brought to their canonical polynomial form as whole chains, so like terms are collected in one pass.
+    Every node remembers its normal form, so subtrees that were already simplified are returned as the same object instead of being rebuilt.
     """
-    def __init__(self, parent):
-        self.parent = parent
-
-    def _simplify_list(self, list_, operation):
-        if len(list_) > 1:
-            elem = list_[0]
-            rest = list_[1:]
-            for index, atom in enumerate(rest):
-                simplification = operation(elem, atom).simplify_expr()
-                if type(simplification) != operation:
-                    list_[index+1] = simplification
-                    list_ = self._simplify_list(list_[1:], operation)
-                    return list_
-            return [elem] + self._simplify_list(rest, operation)
-        else:
-            return list_
-
-    def simplify_list(self):
-        return self.parent.to_ast(self._simplify_list(self.parent.to_list(), type(self.parent)))
-
-    def simplify_expr(self):
-        return self.parent
-
-    def simplify(self):
-        simplifier = self.simplify_expr().get_simplifier()
-        return simplifier.simplify_list()
-
-class Var(Atom):
-    def __init__(self,value, parent):
-        super().__init__(parent)
-        self.value = value
-
-class Num(Atom):
-    def __init__(self,value, parent):
-        super().__init__(parent)
-        self.value = value
-
-class BinaryOperator(Atom):
-    def __init__(self, left, right, parent):
-        super().__init__(parent)
-        self.left = left
-        self.right = right
-
-class Div(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-    
-    def simplify_expr(self):
-        left = self.left
-        right = self.right
-        # 0 / expr = 0
-        if left == 0:
-            return atoms.Num(0)
-
-        # expr / 1 = expr
-        elif right == 1:
-            return left.simplify()
-
-        # reduce fraction
-        elif type(left) == atoms.Num and type(right) == atoms.Num:
-            a = left.num
-            b = right.num
-            if type(a) == int and type(b) == int:
-                div = gcd(a,b)
-                a = atoms.Num(int(a/div))
-                b = atoms.Num(int(b/div))
-                return a / b
-
-        else:
-            return left.simplify() / right.simplify()
-
-class Mul(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def _isNumMul(self, left, right):
-        if type(left) == atoms.Num and type(right) == atoms.Num:
-            return True
-        else:
-            return False
-
-    def isNumMul(self):
-        return self._isNumMul(self.left, self.right)
-    
-    def simplify_expr(self):
-        left = self.left
-        right = self.right
-        # 0 * expr = 0
-        if left == 0:
-            return atoms.Num(0)
-
-        # expr * 0 = 0
-        elif right == 0:
-            return atoms.Num(0)
-
-        # 1 * expr = expr
-        elif left == 1:
-            return right.simplify()
-
-        # expr * 1 = expr
-        elif right == 1:
-            return left.simplify()
-
-        # expr * constant = constant * expr
-        elif type(right) == atoms.Num and type(left) != atoms.Num:
-            return right * left.simplify()
-
-        # a/b * c/d = (a*c)/(b*d)
-        elif type(left) == atoms.Div and type(right) == atoms.Div:
-            a = left.left ; b = left.right
-            c = right.left ; d = right.right
-            return (a.simplify() * c.simplify()) / (b.simplify() * d.simplify())
-
-        # expr ^ a * expr ^ b = expr ^ (a+b)
-        elif type(left) == atoms.Expon and type(right) == atoms.Expon:
-            if type(left.right) == atoms.Num == type(right.right) and str(left.left) == str(right.left):
-                expr = left.left
-                a = left.right ; b = right.right
-                return expr.simplify() ** (a + b)
-            else:
-                return left.simplify() * right.simplify()
-
-        # a * (b * x) = (a*b)*x
-        elif type(left) == atoms.Num and type(right) == atoms.Mul and type(right.left) == atoms.Num:
-            a = left ; b = right.left ; x = right.right
-            return (a*b) * x.simplify()
-
-        # a * (b/c) = (a*b)/c
-        elif type(left) == atoms.Num and type(right) == atoms.Div and type(right.left) == atoms.Num:
-            a = left ; b = right.left ; c = right.right
-            return (a*b) / c.simplify()
-
-        # (b/c)*a = (a*b)/c
-        elif type(right) == atoms.Num and type(left) == atoms.Div and type(left.left) == atoms.Num:
-            b = left.left ; c = left.right ; a = right
-            return (a*b) / c.simplify()
-
-        # (a^b) * expr = expr * (a^b) # changing order
-        elif type(left) == atoms.Expon and type(right) != atoms.Expon:
-            return right.simplify() * left.simplify()
-        
-        # a * ((b*c)*expr) = (a*b*c)*expr
-        elif type(left) == atoms.Num and type(right) == atoms.Mul and type(right.left) == atoms.Mul and self._isNumMul(right.left.left, right.left.right):
-            a = left
-            b = right.left.left
-            c = right.left.right
-            expr = right.right.simplify()
-            return (a*b*c) * expr
-
-        # a * (expr*(b*c)) = (a*b*c)*expr
-        elif type(left) == atoms.Num and type(right) == atoms.Mul and type(right.right) == atoms.Mul and self._isNumMul(right.right.left, right.right.right):
-            a = left
-            expr = right.left.simplify()
-            b = right.right.left
-            c = right.right.right
-            return (a*b*c) * expr
-
-        # (expr*(b*c))*a = (a*b*c)*expr
-        elif type(right) == atoms.Num and type(left) == atoms.Mul and type(left.right) == atoms.Mul and self._isNumMul(left.right.left, left.right.right):
-            a = right
-            b = left.right.left
-            c = left.right.right
-            expr = left.left.simplify()
-            return (a*b*c) * expr
-
-        # ((b*c)*expr)*a = (a*b*c)*expr
-        elif type(right) == atoms.Num and type(left) == atoms.Mul and type(left.left) == atoms.Mul and self._isNumMul(left.left.left, left.left.right):
-            a = right
-            b = left.left.left
-            c = left.left.right
-            expr = left.right.simplify()
-            return (a*b*c) * expr
-
-        # expr * expr = expr^2
-        elif str(left) == str(right):
-            expr = left.simplify()
-            return expr ** 2
-
-        # expr * expr ^ a
-        elif type(right) == atoms.Expon and str(left) == str(right.left):
-            expr = left.simplify()
-            a = right.right
-            return expr ** (a + 1)
-
-        # (a/x)(x^b) = ax^(b-1)
-        elif type(left) == atoms.Div and type(right) == atoms.Expon and str(left.right) == str(right.left) and type(right.right) == atoms.Num:
-            a = left.left
-            x = left.right
-            b = right.right
-            return a * (x ** (b - 1).simplify())
-
-        else:
-            return left.simplify() * right.simplify()
-            
-class Plus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def simplify_expr(self):
-        left = self.left
-        right = self.right
-        # 0 + expr = expr
-        if left == 0:
-            return right.simplify()
-
-        # expr + 0 = expr
-        elif right == 0:
-            return left.simplify()
-
-        # ln a + ln b = ln (a*b)
-        elif type(left) == atoms.Ln and type(right) == atoms.Ln and len(left.args) == 1 and len(right.args) == 1:
-            return atoms.Ln(left.args[0].simplify() * right.args[0].simplify())
-
-        # a * x + x = (a+1) * x
-        elif type(left) == atoms.Mul and type(left.left) == atoms.Num and str(left.right) == str(right):
-            return (left.left + 1) * left.right
-
-        # expr + expr = 2*expr
-        elif str(left) == str(right):
-            return left * 2
-
-        # a*expr + b*expr = (a+b) * expr
-        elif type(left) == atoms.Mul and type(right) == atoms.Mul:
-            if type(left.left) == atoms.Num and type(right.left) == atoms.Num and str(left.right) == str(right.right):
-                return (left.left + right.left) * left.right.simplify()
-            else:
-                return left.simplify() + right.simplify()
-
-        else:
-            return left.simplify() + right.simplify()
-    
-class Minus(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def simplify_expr(self):
-        left = self.left
-        right = self.right
-        # 0 - expr = expr
-        if left == 0:
-            return atoms.Num(-1) * right.simplify()
-
-        # expr - 0 = expr
-        elif right == 0:
-            return left.simplify()
-
-        # expr - expr = 0
-        elif str(left) == str(right):
-            return atoms.Num(0)
-
-        # ln a - ln b = ln (a/b)
-        elif type(left) == atoms.Ln and type(right) == atoms.Ln and len(left.args) == 1 and len(right.args) == 1:
-            return atoms.Ln(left.args[0].simplify() / right.args[0].simplify())
-
-        # a*var - b*var = (a-b) * var
-        elif type(left) == atoms.Mul and type(right) == atoms.Mul:
-            if type(left.left) == atoms.Num and type(right.left) == atoms.Num and str(left.right) == str(right.right):
-                return (left.left - left.right) * left.right.simplify()
-            else:
-                return left.simplify() - right.simplify()
-        else:
-            return left.simplify() - right.simplify()
-
-class Expon(BinaryOperator):
-    def __init__(self, left, right, parent):
-        super().__init__(left, right, parent)
-
-    def simplify_expr(self):
-        left = self.left
-        right = self.right
-
-        # expr ^ 1 = expr
-        if type(right) == atoms.Num and right == 1:
-            return left.simplify()
-
-        # expr ^ 0 = 1
-        elif type(right) == atoms.Num and right == 0:
-            return atoms.Num(1)
-
-        # ((x ^ a) ^ b) = x ^ (a*b)
-        elif type(left) == atoms.Expon and type(right) == atoms.Num:
-            if type(left.right) == atoms.Num:
-                return left.left.simplify() ** (left.right * right)
-            else:
-                return left.simplify() ** right.simplify()
-
-        else:
-            return left.simplify() ** right.simplify()
-
-class Function(Atom):
-    def __init__(self, name, args, parent):
-        super().__init__(parent)
-        self.name = name
-        self.args = args
-
-    def simplify_expr(self):
-        class_ = type(self.parent)
-        if class_ in atoms.BUILT_IN_FUNCTIONS:
-            return class_([a.simplify() for a in self.args])
-        else:
-            return class_(self.name, [a.simplify() for a in self.args])
-
-class Sin(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-class Cos(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-class Tan(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-class Exp(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-    
-    def simplify_expr(self):
-        if len(self.args) == 1:
-            arg = self.args[0]
-            if type(arg) == atoms.Mul and type(arg.right) == atoms.Ln and len(arg.right.args) == 1:
-                return atoms.Expon(arg.right.args[0].simplify(), arg.left.simplify())
-            else:
-                return self.parent
-        else:
-            return self.parent
-
-class Ln(Function):
-    def __init__(self, name, args, parent):
-        super().__init__(name, args, parent)
-
-    def simplify_expr(self):
-        args = self.args
-        # ln a^b = b * ln a
-        if len(args) == 1 and type(args[0]) == atoms.Expon:
-            return args[0].right.simplify() * atoms.Ln([args[0].left.simplify()])
-        else:
-            return self.parent
+    simplified = getattr(expr, "_simplified", None)
+    if simplified is not None:
+        return simplified
+    cancellation = getattr(_state, "cancellation", None)
+    if cancellation is not None and cancellation.is_set():
+        raise Cancelled()
+
+    if polynomials.is_chain(expr):
+        # the whole chain of a sum or a product is collected at once, its operands are simplified on the way
+        node = polynomials.collect(expr, simplify)
+        if type(node) == atoms.Sum:
+            # the products in the sum were collected as its terms, the rules of products are applied to them here
+            terms = rebuild(node, [_rewrite_product(term) for term in node.args])
+            if terms is not node:
+                node = polynomials.collect(terms)
+    else:
+        node = rebuild(expr, [simplify(child) for child in expr.children()])
+        if polynomials.is_chain(node):
+            # e.g. a division whose denominator was folded to a number
+            node = polynomials.collect(node)
+    result = engine.rewrite(node)
+    if result is None:
+        result = node
+
+    if result == node:
+        result = node
+    else:
+        if profiler.enabled:
+            profiler.count("simplify iterations")
+        result = simplify(result)
+    if profiler.enabled:
+        profiler.count("simplified nodes")
+
+    _memoize(expr, result)
+    _memoize(node, result)
+    _memoize(result, result)
+    return result
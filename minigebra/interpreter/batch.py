@@ -0,0 +1,120 @@
+"""
+Headless batch mode of the interpreter. Statements are read as a stream, one input per line, and the results are written
+as JSON Lines. Qt is not imported, so the batch mode runs on machines without a display.
+
+Usage:
+
+    python -m minigebra.interpreter.batch [input] [-o output] [--samples directory]
+
+Input and output default to the standard input and output. Each line is interpreted like a line of the command line
+interface, commands apply to all following lines. Every expression produces one record:
+
+    {"line": 1, "index": 0, "input": "x^2+x*x", "simplified": "2(x ^ 2)", "derivatives": ["4x"], "latex": ["2(x^{2})", "4x"]}
+
+A line which cannot be interpreted produces a record with "error" instead. If a samples directory is given, the plotted
+samples of each order are saved as (2, n) arrays of x and y in .npy files and their paths are listed under "samples".
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Iterable, Iterator, TextIO
+
+import numpy as np
+
+from .interpreter import Interpreter
+from .preprocessor import Preprocessor
+
+def interpret_stream(lines: Iterable[str], interpreter: Interpreter = None, samples: str = None) -> Iterator[dict]:
+    """
+    Interprets the lines one by one and yields a record for every expression, or an error record for a failed line.
+    """
+    interpreter = interpreter or Interpreter()
+    database = interpreter.database
+    for number, text in enumerate(lines, start=1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            commands, expressions = interpreter.compile(text, raise_errors=True)
+            interpreter.interpret_commands(commands)
+            if not expressions:
+                continue
+            interpreter.interpret_exprs(expressions)
+            if samples is not None:
+                interpreter.generate_data()
+        except Exception as e:
+            yield {"line": number, "input": text, "error": str(e)}
+            continue
+
+        # records name the statements as they were written, the parsed expressions may print ambiguously, e.g. x*x as xx
+        _, statements = Preprocessor(text).preprocess()
+        for index, (statement, tower) in enumerate(zip(statements, database.towers)):
+            try:
+                orders = tower.derivatives(database.diff_order)
+                record = {
+                    "line": number,
+                    "index": index,
+                    "input": statement,
+                    "simplified": str(orders[0]),
+                    "derivatives": [str(diff) for diff in orders[1:]],
+                    "latex": [diff.print("latex") for diff in orders],
+                }
+                if samples is not None:
+                    record["samples"] = save_samples(samples, number, index, [group[index] for group in database.plot_data])
+            except Exception as e:
+                record = {"line": number, "index": index, "input": statement, "error": str(e)}
+            yield record
+
+def save_samples(directory: str, line: int, index: int, plots: list) -> list[str]:
+    """
+    Saves samples of the expression and its derivatives into the directory. Plots which cannot be sampled are listed as None.
+    """
+    paths = []
+    for order, plot in enumerate(plots):
+        try:
+            x, y = plot.generate()
+        except Exception:
+            paths.append(None)
+            continue
+        path = os.path.join(directory, f"{line}_{index}_{order}.npy")
+        np.save(path, np.vstack([x, y]))
+        paths.append(path)
+    return paths
+
+def run_batch(source: TextIO, output: TextIO, samples: str = None) -> int:
+    """
+    Interprets the statements of source and writes the records to output as they are produced. Returns the number of failed records.
+    """
+    if samples is not None:
+        os.makedirs(samples, exist_ok=True)
+    failed = 0
+    for record in interpret_stream(source, samples=samples):
+        failed += "error" in record
+        output.write(json.dumps(record) + "\n")
+    output.flush()
+    return failed
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line entry point of the batch mode.
+    """
+    parser = argparse.ArgumentParser(prog="python -m minigebra.interpreter.batch", description="Interprets statements in bulk and writes the results as JSON Lines.")
+    parser.add_argument("input", nargs="?", help="file with one input per line, standard input by default")
+    parser.add_argument("-o", "--output", help="file for the JSON Lines, standard output by default")
+    parser.add_argument("--samples", help="directory where samples of the plots are saved as .npy files")
+    args = parser.parse_args(argv)
+
+    source = open(args.input) if args.input else sys.stdin
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        failed = run_batch(source, output, args.samples)
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            output.close()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Bounded mapping which forgets the least recently used entries first. Counts hits and misses of lookups.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__data
+
+    def __repr__(self) -> str:
+        return f"LRUCache(size: {len(self)}/{self.maxsize}, hits: {self.hits}, misses: {self.misses})"
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored under key and marks it as recently used.
+        """
+        try:
+            value = self.__data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        """
+        Stores the value under key. Forgets the least recently used entry if the cache is full.
+        """
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def get_or_create(self, key, factory: callable):
+        """
+        Returns the value stored under key, otherwise creates it with factory() and stores it.
+        """
+        value = self.get(key, self)
+        if value is self:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters.
+        """
+        self.__data.clear()
+        self.hits = 0
+        self.misses = 0
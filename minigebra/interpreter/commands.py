@@ -104,5 +104,62 @@ class Precision(Command):
     def __init__(self, text:str):
         super().__init__(text)
 
-VALID_COMMANDS = [Domain, Vars, Params, DiffOrder, Precision]
+class Sampling(Command):
+    """
+    Usage:
+
+        "sampling: uniform" - the domain is discretized uniformly with steps given by the precision command
+
+        "sampling: adaptive, tolerance, budget" - the domain is discretized adaptively, more samples are placed where the plot bends
+        tolerance (optional) - allowed deviation of the plot from the function relative to the height of the plot
+        budget (optional) - maximal number of samples of a single plot
+
+    Example:
+
+        "sampling: adaptive, 0.001, 5000" - plots are refined until they deviate by less than 0.1% of their height or until they have 5000 samples
+
+    """
+    name = "sampling"
+    def __init__(self, text:str):
+        super().__init__(text)
+
+class Workers(Command):
+    """
+    Usage:
+
+        "workers: int" - specifies the number of processes which evaluate plots in parallel, 1 evaluates plots in the main process, 0 uses all cores
+
+        "workers: int, min_samples" - also specifies the smallest number of expressions times samples which is evaluated by the processes
+
+    Example:
+
+        "workers: 4" - large sets of plots are evaluated by 4 processes, small sets are still evaluated in the main process
+
+        "workers: 4, 0" - every set of several plots is evaluated by 4 processes
+
+    """
+    name = "workers"
+    def __init__(self, text:str):
+        super().__init__(text)
+
+class Profile(Command):
+    """
+    Usage:
+
+        "profile: on" - times the phases of the interpreter and prints a summary after each input
+
+        "profile: on, path" - the phases are also written into the file as a chrome trace (chrome://tracing)
+
+        "profile: off" - stops timing
+
+    Example:
+
+        "profile: on, trace.json" - prints timings of each input and keeps trace.json up to date
+
+    """
+    name = "profile"
+    def __init__(self, text:str):
+        super().__init__(text)
+
+VALID_COMMANDS = [Domain, Vars, Params, DiffOrder, Precision, Sampling, Workers, Profile]
 VALID_NAMES = [i.name for i in VALID_COMMANDS]
\ No newline at end of file
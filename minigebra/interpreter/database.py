@@ -2,6 +2,8 @@ from .atoms import BUILT_IN_FUNCTIONS
 
 # for type hints
 from .atoms import Atom, Function
+from .derivatives import DerivativeTower
+from .parallel import MIN_SAMPLES
 
 class Database:
     """
@@ -9,10 +11,32 @@ class Database:
     """
     built_in_functions: list[Function] = BUILT_IN_FUNCTIONS
     def __init__(self):
-        self.expressions: list[list[Atom]] = []
+        self.towers: list[DerivativeTower] = []
         self.variables: list[str] = ["x"]
         self.parameters: list[str] = ["a"]
         self.domain: tuple[int] = (-10,10)
         self.diff_order: int = 1
         self.precision: float = 0.01
+        self.sampling: str = "uniform"
+        self.tolerance: float = 1e-3
+        self.budget: int = 4000
+        self.workers: int = 1
+        self.min_samples: int = MIN_SAMPLES # smallest number of expressions times samples evaluated by the workers
         self.plot_data = []
+        self.interning: bool = True
+        self.changed: list[int] = None # indices of expressions changed by the last input, None if all of them changed
+
+    def settings(self) -> tuple:
+        """
+        Returns the global settings which affect every expression.
+        """
+        return (tuple(self.variables), tuple(self.parameters), self.domain, self.diff_order, self.precision, self.sampling, self.tolerance, self.budget)
+
+    @property
+    def expressions(self) -> list[list[Atom]]:
+        """
+        Expressions and their derivatives grouped by the order of differentiation. Missing derivatives are computed on access.
+        """
+        if len(self.towers) == 0:
+            return []
+        return [[tower[order] for tower in self.towers] for order in range(self.diff_order + 1)]
@@ -0,0 +1,32 @@
+# for type hinting
+from .atoms import Atom
+
+from .profiler import profiler
+
+class DerivativeTower:
+    """
+    Holds an expression together with its derivatives. Derivatives are computed lazily, only when an order is requested.
+    Each order is simplified before it is differentiated again, so the expressions do not swell with the order of differentiation.
+    """
+    def __init__(self, expr: Atom, simplify: callable):
+        self.expr = expr
+        self.simplify = simplify
+        self.orders: list[Atom] = [simplify(expr)]
+
+    def __getitem__(self, order: int) -> Atom:
+        """
+        Returns the derivative of the given order, the original expression has order 0.
+        """
+        while len(self.orders) <= order:
+            with profiler.phase("diff", order=len(self.orders), expr=self.orders[0]):
+                self.orders.append(self.simplify(self.orders[-1].diff()))
+        return self.orders[order]
+
+    def __repr__(self) -> str:
+        return f"DerivativeTower({self.orders[0]}, computed orders: {len(self.orders)})"
+
+    def derivatives(self, diff_order: int) -> list[Atom]:
+        """
+        Returns the expression and its derivatives up to diff_order (including).
+        """
+        return [self[order] for order in range(diff_order + 1)]
@@ -1,4 +1,4 @@
-from PyQt5.QtWidgets import QApplication
+import os
 import sys
 
 from .atoms import Atom
@@ -7,8 +7,12 @@ from .parser import Parser
 from .preprocessor import Preprocessor
 from .database import Database
 from .commands import Command
-
-from ..gui.canvas import Canvas, PlotData
+from .derivatives import DerivativeTower
+from .planner import EvaluationPlan
+from .parallel import ParallelSampler
+from .cache import LRUCache
+from .sampling import PlotData
+from .profiler import profiler, count_nodes
 
 class Interpreter:
     """
@@ -18,7 +22,10 @@ class Interpreter:
 
     def __init__(self):
         self.database = Database()
-        self.database.expressions = self.database.expressions
+        self.parse_cache = LRUCache(maxsize=256)
+        self.__plan = None
+        self.__sampler = None
+        self.__plot_cache = {}
 
     def print_expressions(self, padding: int = 1) -> None:
         """
@@ -50,52 +57,116 @@ class Interpreter:
 
     def diff(self, diff_order: int = 1) -> None:
         """
-        Produces derivatives of the original expressions (up to differentiation order, including).
+        Produces derivatives of the original expressions (up to differentiation order, including) ahead of time.
+        Without calling diff, each derivative is produced when it is first displayed or plotted.
         """
-        expr = self.database.expressions[0]
-        self.database.expressions=[expr]
-
-        for _ in range(diff_order):
-            expr = [i.diff() for i in expr]
-            self.database.expressions.append(expr)
+        with profiler.phase("diff", order=diff_order):
+            for tower in self.database.towers:
+                tower[diff_order]
 
     def simplify(self) -> None:
         """
-        Simplifies the original expressions.
+        Simplifies the original expressions and their derivatives up to the differentiation order of the database.
+        The towers simplify every expression when they produce it, so only the missing derivatives are computed.
         """
-        self.database.expressions = [[self.__simplify_internal(expr) for expr in elem] for elem in self.database.expressions]
+        for tower in self.database.towers:
+            tower.derivatives(self.database.diff_order)
 
     def generate_data(self) -> None:
         """
         Generates plotting data for each expression and it's derivatives.
+        Plotting data of expressions which did not change is reused. With uniform sampling, the remaining expressions are evaluated together on a single shared grid, see EvaluationPlan.
+        Large sets of expressions are evaluated by a pool of processes if more workers are set, see ParallelSampler.
         """
-        self.database.plot_data = [[PlotData(expr, self.database.variables, self.database.domain, self.database.precision) for expr in elem] for elem in self.database.expressions]
+        with profiler.phase("generate_data"):
+            self.__generate_data()
+
+    def __generate_data(self) -> None:
+        database = self.database
+        expressions = database.expressions
+        vars = database.variables[:1]
+        sampling = (database.tolerance, database.budget) if database.sampling == "adaptive" else None
+        settings = (tuple(vars), database.domain, database.precision, sampling)
+        missing = list(dict.fromkeys([expr for elem in expressions for expr in elem if (expr, settings) not in self.__plot_cache]))
+
+        plot_cache = {}
+        if missing and sampling:
+            # adaptively sampled plots do not share their samples, each plot samples itself when it is generated
+            for expr in missing:
+                plot_cache[(expr, settings)] = PlotData(expr, database.variables, database.domain, database.precision, sampling=sampling)
+
+        elif missing:
+            x = PlotData(None, vars, database.domain, database.precision).grid()
+            if self.__sampler is None or self.__sampler.workers != database.workers:
+                if self.__sampler is not None:
+                    self.__sampler.shutdown()
+                self.__sampler = ParallelSampler(database.workers)
+            self.__sampler.min_samples = database.min_samples
+            if self.__sampler.parallel(len(missing), len(x)):
+                values = self.__sampler(missing, vars, x)
+            else:
+                if self.__plan is None or not self.__plan.matches([missing], vars):
+                    self.__plan = EvaluationPlan([missing], vars)
+                values = self.__plan(x)[0]
+            for expr, y in zip(missing, values):
+                plot_cache[(expr, settings)] = PlotData(expr, database.variables, database.domain, database.precision, None if y is None else (x, y))
+
+        for elem in expressions:
+            for expr in elem:
+                key = (expr, settings)
+                if key not in plot_cache:
+                    plot_cache[key] = self.__plot_cache[key]
+        self.__plot_cache = plot_cache
+        database.plot_data = [[plot_cache[(expr, settings)] for expr in elem] for elem in expressions]
 
     def __simplify_internal(self, expr: Atom):
         """
-        Keeps simplifying the expression recursively until no changes are made.
+        Simplifies the expression to its normal form in a single bottom-up pass.
         """
-        simplified = expr.simplify()
-        while str(simplified) != str(expr):
-           expr = simplified 
-           simplified = expr.simplify()
-        return simplified
+        if not profiler.enabled:
+            return self.__intern(self.__intern(expr).simplify())
+        with profiler.phase("simplify", expr=expr, nodes=count_nodes(expr)):
+            result = self.__intern(self.__intern(expr).simplify())
+        profiler.count("nodes before simplify", count_nodes(expr))
+        profiler.count("nodes after simplify", count_nodes(result))
+        return result
 
-    def compile(self, input):
+    def __intern(self, expr: Atom) -> Atom:
+        """
+        Replaces the expression by its shared instance if interning is enabled.
+        """
+        if self.database.interning:
+            return expr.intern()
+        return expr
+
+    def compile(self, input, raise_errors: bool = False):
         """
         Accepts input expressions and commands as strings and produces according commands and expressions from them.
+        Parsed statements are cached by their normalized text, so unchanged statements are not parsed again.
+        Errors are printed unless raise_errors is set.
         """
         try:
-            commands, exprs = Preprocessor(input).preprocess()
+            with profiler.phase("preprocess"):
+                commands, exprs = Preprocessor(input).preprocess()
             p = Parser(Tokenizer(), self.database.built_in_functions)
-            commands = [p.parse_command(comm) for comm in commands]
-            expressions = [p.parse_expr(expr) for expr in exprs]
+            commands = [self.__parse(comm, p.parse_command) for comm in commands]
+            expressions = [self.__parse(expr, p.parse_expr) for expr in exprs]
             return commands, expressions
 
         except Exception as e:
+            if raise_errors:
+                raise
             print(e)
             return None, None
 
+    def __parse(self, statement: str, parse: callable):
+        """
+        Parses a single statement. Statements which differ only in whitespace share one entry of the parse cache.
+        """
+        key = (parse.__name__, " ".join(statement.split()))
+        with profiler.phase("parse", statement=statement):
+            return self.parse_cache.get_or_create(key, lambda: parse(statement))
+
     def print_commands(self, commands:list, padding: int = 1) -> None:
         """
         Print information about commands on the standart input.
@@ -108,11 +179,11 @@ class Interpreter:
 
     def interpret_exprs(self, exprs: list[Atom]) -> None:
         """
-        Accepts list of expressions as input. Simplifies and differentiates this input. Saves it into the database.
+        Accepts list of expressions as input. Simplifies this input and saves it into the database. Derivatives are computed lazily.
+        Expressions which were already interpreted keep their simplifications and derivatives.
         """
-        self.database.expressions = [exprs]
-        self.diff(self.database.diff_order)
-        self.simplify()
+        towers = {tower.expr: tower for tower in self.database.towers}
+        self.database.towers = [towers[expr] if expr in towers else DerivativeTower(expr, self.__simplify_internal) for expr in exprs]
 
     def interpret_commands(self, commands: list[Command]):
         """
@@ -133,7 +204,44 @@ class Interpreter:
                 self.database.precision = float(command.params[0])
             elif name == "diff_order":
                 self.database.diff_order = int(command.params[0])
+            elif name == "sampling":
+                sampling = command.params[0].strip()
+                if sampling not in ["uniform", "adaptive"]:
+                    raise Exception(f"Unknown sampling {sampling}. Supported samplings are uniform and adaptive.")
+                # all parameters are validated before the settings change
+                tolerance = float(command.params[1]) if len(command.params) > 1 else self.database.tolerance
+                budget = int(command.params[2]) if len(command.params) > 2 else self.database.budget
+                self.database.sampling = sampling
+                self.database.tolerance = tolerance
+                self.database.budget = budget
+            elif name == "workers":
+                workers = int(command.params[0]) or os.cpu_count()
+                min_samples = int(command.params[1]) if len(command.params) > 1 else self.database.min_samples
+                if workers < 0 or min_samples < 0:
+                    raise Exception("Number of workers and the minimal number of samples can not be negative.")
+                self.database.workers = workers
+                self.database.min_samples = min_samples
+            elif name == "profile":
+                state = command.params[0].strip()
+                trace_path = command.params[1].strip() if len(command.params) > 1 else None
+                if state not in ["on", "off"]:
+                    raise Exception(f"Unknown profile state {state}. Supported states are on and off.")
+                elif len(command.params) > 2 or (state == "off" and trace_path is not None):
+                    raise Exception("Too many profile parameters. Usage is profile: on, profile: on, path or profile: off.")
+                elif trace_path is not None and not self.__writable(trace_path):
+                    raise Exception(f"Can not write the profile trace into {trace_path!r}.")
+                if state == "on":
+                    profiler.enable(trace_path)
+                else:
+                    profiler.disable()
         
+    def __writable(self, path: str) -> bool:
+        """
+        Checks whether a file can be written at the path, i.e. the path is not empty, not a directory and its directory exists.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        return path != "" and not os.path.isdir(path) and os.path.isdir(directory) and os.access(directory, os.W_OK)
+
     def interpreter_loop(self, plot: bool =False, padding: int =1) -> None:
         """
         This functions provides the command line interface.
@@ -143,30 +251,51 @@ class Interpreter:
             commands, expressions = self.compile(text)
             if commands:
                 self.print_commands(commands, padding=padding)
-                self.interpret_commands(commands)
+                try:
+                    self.interpret_commands(commands)
+                except Exception as e:
+                    # invalid commands are reported like compile errors, the rest of the input is skipped
+                    print(e)
+                    continue
 
             if expressions:
                 try:
                     self.interpret_exprs(expressions)
                     self.print(padding=padding)
                     if plot:
+                        from PyQt5.QtWidgets import QApplication
+                        from ..gui.canvas import Canvas
                         self.generate_data()
-                        app = QApplication(sys.argv)
+                        app = QApplication.instance() or QApplication(sys.argv)
                         canvas = Canvas()
                         canvas.montage(self.database.plot_data)
                         canvas.show()
                         app.exec_()
                         del canvas
-                        del app
 
                 except Exception as e:
                     print(e)
+                try:
+                    profiler.report(padding=padding)
+                except OSError as e:
+                    # e.g. the trace file was removed together with its directory
+                    print(e)
                 print("")
 
     def interpret_text(self, input: str) -> None:
         """
         Interprets commands and expressions in the input string. 
+        Only the statements which changed since the previous input are recomputed, unless a command changed the global settings.
+        Indices of the changed expressions are saved into the database.
         """
         commands, expressions = self.compile(input)
+        settings = self.database.settings()
+        previous = self.database.towers
+        self.interpret_commands(commands)
         self.interpret_exprs(expressions)
-        self.interpret_commands(commands)
\ No newline at end of file
+
+        towers = self.database.towers
+        if settings != self.database.settings() or len(towers) != len(previous):
+            self.database.changed = None
+        else:
+            self.database.changed = [i for i, (tower, old) in enumerate(zip(towers, previous)) if tower is not old]
\ No newline at end of file
@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+import pickle
+import numpy as np
+
+from .atoms.compilers import CompileError
+from .tape import TapeBuilder, Tape
+
+# for type hinting
+from .atoms import Atom
+
+# smallest job (expressions times samples) sent to the workers by default. A round trip to a warm pool costs about 4 ms,
+# a compiled expression about 20 ns per sample, so with two workers the pool pays off at roughly 200 000 samples
+MIN_SAMPLES = 200_000
+
+def _sample(name: str, shape: tuple[int], rows: list[int], tape: Tape) -> None:
+    """
+    Runs in a worker process. Evaluates the tape on the samples in the first row of the shared block and writes the results into the rows.
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+        for row, result in zip(rows, tape(block[0])):
+            block[row] = result
+        del block
+    finally:
+        memory.close()
+
+class ParallelSampler:
+    """
+    Evaluates many expressions on one grid of samples in a pool of worker processes.
+    Expressions are split into one chunk per worker, each chunk is lowered into a single Tape which is sent to the worker.
+    The workers write the samples into a shared memory block, so only the flat arrays of the tapes are pickled, not the samples.
+    """
+    def __init__(self, workers: int = 1, min_samples: int = MIN_SAMPLES):
+        self.workers = workers
+        self.min_samples = min_samples # smaller jobs are evaluated in the calling process
+        self.__executor = None
+
+    def parallel(self, count: int, samples: int) -> bool:
+        """
+        Determines whether count expressions evaluated on the given number of samples are worth sending to the workers.
+        """
+        return self.workers > 1 and count > 1 and count * samples >= self.min_samples
+
+    def executor(self) -> ProcessPoolExecutor:
+        """
+        Starts the worker processes on first use.
+        """
+        if self.__executor is None:
+            # forking a process with running gui threads is unsafe, so the workers are spawned
+            self.__executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.__executor
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker processes.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
+
+    def __call__(self, exprs: list[Atom], vars: list[str], x: np.ndarray) -> list[np.ndarray]:
+        """
+        Evaluates the expressions on the samples x of the first variable. Returns one array per expression,
+        or None for expressions which could not be compiled.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        shape = (len(exprs) + 1, len(x))
+        memory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+        try:
+            block = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+            block[0] = x
+            compiled = [False] * len(exprs)
+            futures = []
+            size = -(-len(exprs) // self.workers)
+            for start in range(0, len(exprs), size):
+                builder = TapeBuilder(vars)
+                outputs, rows = [], []
+                for i in range(start, min(start + size, len(exprs))):
+                    try:
+                        outputs.append(builder.emit(exprs[i]))
+                        rows.append(i + 1)
+                        compiled[i] = True
+                    except CompileError:
+                        pass
+                if not outputs:
+                    continue
+                tape = builder.build(outputs)
+                try:
+                    pickle.dumps(tape.functions)
+                except Exception:
+                    # functions which can not be sent to the workers are evaluated here
+                    for row, result in zip(rows, tape(x)):
+                        block[row] = result
+                    continue
+                futures.append(self.executor().submit(_sample, memory.name, shape, rows, tape))
+            [future.result() for future in futures]
+            results = [np.array(block[i + 1]) if compiled[i] else None for i in range(len(exprs))]
+            del block
+            return results
+        finally:
+            memory.close()
+            memory.unlink()
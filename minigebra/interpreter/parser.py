@@ -1,4 +1,4 @@
-from .atoms import Mul, Expon, Div, Plus, Minus, Var, Function, Num, Atom
+from .atoms import Sum, Product, Expon, Div, Var, Function, Num, Atom, negate
 from .commands import VALID_NAMES, VALID_COMMANDS, Command
 
 # for type hinting
@@ -69,43 +69,46 @@ class Parser:
         if self.current:
             return self.current["type"] in tokens
 
-    def expression(self) -> Plus:
+    def expression(self) -> Sum:
         return self.addition()
 
-    def addition(self) -> Mul:
+    def addition(self) -> Sum:
         """
         Determines whether token is a addition or substraction. Returns resulting token.
+        A chain of additions and substractions is a single Sum, substracted terms are negated.
         """
-        left = self.multiplication()
+        terms = [self.multiplication()]
 
         while self.isToken(['PLUS', 'MINUS']):
             type = self.current["type"]
             self.advance()
             if type == "PLUS":
-                left = Plus(left, self.multiplication())
+                terms.append(self.multiplication())
             elif type == "MINUS":
-                left = Minus(left, self.multiplication())
+                terms.append(negate(self.multiplication()))
 
-        return left
+        return terms[0] if len(terms) == 1 else Sum(terms)
 
     def function(self) -> None:
         pass
 
-    def multiplication(self) -> Expon:
+    def multiplication(self) -> Product:
         """
         Determines whether token is a multiplication or division. Returns resulting token.
+        A chain of multiplications is a single Product, a division divides the product of the preceding factors.
         """
-        left = self.exponentiation()
+        factors = [self.exponentiation()]
 
         while self.isToken(['MUL', 'DIV']):
             type = self.current["type"]
             self.advance()
             if type == "MUL":
-                left = Mul(left, self.exponentiation())
+                factors.append(self.exponentiation())
             elif type == "DIV":
-                left = Div(left, self.exponentiation())
+                left = factors[0] if len(factors) == 1 else Product(factors)
+                factors = [Div(left, self.exponentiation())]
 
-        return left
+        return factors[0] if len(factors) == 1 else Product(factors)
 
     def exponentiation(self) -> Atom:
         """
@@ -0,0 +1,52 @@
+import numpy as np
+
+from .atoms.compilers import KernelBuilder, CompileError
+
+# for type hinting
+from .atoms import Atom
+
+class EvaluationPlan:
+    """
+    Evaluates many expressions together on one shared grid of samples.
+    All expressions are lowered into a single generated function in which common subexpressions are eliminated,
+    so a function and its derivatives evaluate shared parts such as sin(x) or ln(x) only once.
+    """
+    def __init__(self, exprs: list[list[Atom]], vars: list[str]):
+        self.exprs = exprs
+        self.vars = vars
+        builder = KernelBuilder(vars)
+        outputs = []
+        self.planned = []
+        for group in exprs:
+            for expr in group:
+                try:
+                    outputs.append(builder.emit(expr))
+                    self.planned.append(True)
+                except CompileError:
+                    # such expressions are left for the caller to evaluate separately
+                    self.planned.append(False)
+        self.kernel = builder.build(outputs) if outputs else None
+        self.node_count = len(builder.lines)
+
+    def matches(self, exprs: list[list[Atom]], vars: list[str]) -> bool:
+        """
+        Determines whether the plan evaluates the same expressions.
+        """
+        return self.vars == vars and self.exprs == exprs
+
+    def __call__(self, *values: np.ndarray) -> list[list[np.ndarray]]:
+        """
+        Evaluates the plan for the values of the variables. Returns one array per expression, grouped the same way as the expressions,
+        or None for expressions which could not be planned.
+        """
+        results = []
+        if self.kernel is not None:
+            results = self.kernel(*values)
+            results = list(results) if isinstance(results, tuple) else [results]
+        results.reverse()
+        flat = [results.pop() if planned else None for planned in self.planned]
+        grouped = []
+        for group in self.exprs:
+            grouped.append(flat[:len(group)])
+            flat = flat[len(group):]
+        return grouped
@@ -0,0 +1,197 @@
+"""
+Timing instrumentation of the interpreter pipeline. Phases are timed with
+
+    with profiler.phase("parse", statement=text):
+        ...
+
+and counters are increased with profiler.count(name). While the profiler is disabled, phase returns a shared context manager
+which does nothing and counters are not touched. Hot paths check profiler.enabled first, so there the instrumentation
+costs one attribute lookup.
+Timings can be exported as a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import os
+import threading
+import time
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+_NULL_PHASE = _NullPhase()
+
+class _Phase:
+    """
+    Measures a single phase and records it into the profiler when it ends.
+    """
+    def __init__(self, profiler, name: str, args: dict):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+
+class Profiler:
+    """
+    Collects durations of the phases and counters of the current input. Phases of all inputs are kept for the trace if a trace file is set.
+    Each thread records its own current input, e.g. the worker which interprets an input and the gui thread which draws the previous one.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_path: str = None
+        self.trace = [] # chrome trace events since the profiler was enabled
+        self.__origin = time.perf_counter_ns()
+        self.__local = threading.local() # every thread records its own current input
+
+    @property
+    def events(self) -> list:
+        """
+        (name, start, duration) in nanoseconds of the phases of the current input of this thread.
+        """
+        try:
+            return self.__local.events
+        except AttributeError:
+            self.__local.events = []
+            return self.__local.events
+
+    @property
+    def counters(self) -> dict:
+        """
+        Counters of the current input of this thread.
+        """
+        try:
+            return self.__local.counters
+        except AttributeError:
+            self.__local.counters = {}
+            return self.__local.counters
+
+    def enable(self, trace_path: str = None) -> None:
+        """
+        Starts profiling. Phases are also written into trace_path as a chrome trace if it is given.
+        """
+        if self.enabled and self.trace_path == trace_path:
+            # the command is interpreted again with every input
+            return
+        self.enabled = True
+        self.trace_path = trace_path
+        self.trace = []
+        self.reset()
+
+    def disable(self) -> None:
+        """
+        Stops profiling, the trace is written one last time.
+        """
+        self.flush()
+        self.enabled = False
+        self.trace_path = None
+        self.trace = []
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets the phases and counters of the current input of this thread.
+        """
+        self.__local.events = []
+        self.__local.counters = {}
+
+    def phase(self, name: str, **args):
+        """
+        Returns a context manager which measures the phase.
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name, args)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        Increases the counter by n.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name: str, start: int, duration: int, args: dict = None) -> None:
+        """
+        Records a finished phase, times are in nanoseconds of time.perf_counter_ns.
+        """
+        self.events.append((name, start, duration))
+        if self.trace_path is not None:
+            self.trace.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.__origin) / 1000,
+                "dur": duration / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {key: str(value) for key, value in (args or {}).items()},
+            })
+
+    def summary(self, padding: int = 1, snapshot: tuple = None) -> str:
+        """
+        Returns a table with the number of calls and the durations of each phase of the current input, followed by the counters.
+        If a snapshot is given, the table shows its phases and counters instead.
+        """
+        events, counters = snapshot or (self.events, self.counters)
+        phases = {}
+        for name, _, duration in events:
+            calls, total = phases.get(name, (0, 0))
+            phases[name] = (calls + 1, total + duration)
+        pad = "\t" * padding
+        lines = ["Profile:", pad + f"{'phase':<16}{'calls':>8}{'total ms':>12}{'mean ms':>12}"]
+        for name, (calls, total) in phases.items():
+            lines.append(pad + f"{name:<16}{calls:>8}{total / 1e6:>12.3f}{total / calls / 1e6:>12.3f}")
+        for name, value in counters.items():
+            lines.append(pad + f"{name:<28}{value:>12}")
+        return "\n".join(lines)
+
+    def flush(self) -> None:
+        """
+        Writes all phases recorded since the profiler was enabled into the trace file.
+        """
+        if self.enabled and self.trace_path is not None:
+            with open(self.trace_path, "w") as file:
+                json.dump({"traceEvents": list(self.trace), "displayTimeUnit": "ms"}, file)
+
+    def snapshot(self) -> tuple:
+        """
+        Returns the (phases, counters) of the current input of this thread, writes the trace and starts a new input.
+        Returns None if the profiler is disabled. A worker thread passes the snapshot of its input to the thread which reports it.
+        """
+        if not self.enabled:
+            return None
+        snapshot = (self.events, self.counters)
+        self.reset()
+        self.flush()
+        return snapshot
+
+    def report(self, padding: int = 1, snapshot: tuple = None) -> None:
+        """
+        Prints the summary of the current input of this thread, writes the trace and starts a new input.
+        If a snapshot of the input taken by another thread is given, its phases and counters are reported together with those of this thread.
+        """
+        own = self.snapshot()
+        if own is None:
+            return
+        if snapshot is not None:
+            events, counters = snapshot
+            counters = dict(counters)
+            for name, value in own[1].items():
+                counters[name] = counters.get(name, 0) + value
+            own = (events + own[0], counters)
+        print(self.summary(padding, own))
+
+# profiler shared by the whole pipeline
+profiler = Profiler()
+
+def count_nodes(expr) -> int:
+    """
+    Counts nodes of the expression tree, shared subtrees are counted each time they occur.
+    """
+    return 1 + sum([count_nodes(child) for child in expr.children()])
@@ -0,0 +1,172 @@
+import numpy as np
+
+from .cache import LRUCache
+from .profiler import profiler
+
+def uniform_grid(domain: tuple[float], precision: float) -> np.ndarray:
+    """
+    Discretizes the domain into equidistant samples, precision is the size of a step.
+    """
+    a,b = domain
+    num = int(np.abs(b-a)/precision)
+    return np.linspace(a,b,num)
+
+def _scale(y: np.ndarray) -> float:
+    """
+    Estimates the height of the plotted curve, singularities are ignored.
+    """
+    finite = y[np.isfinite(y)]
+    if len(finite) == 0:
+        return 1.0
+    low, high = np.percentile(finite, [2, 98])
+    return max(high - low, 1e-12)
+
+def adaptive_samples(func: callable, domain: tuple[float], tolerance: float = 1e-3, budget: int = 4000, initial: int = 64, max_angle: float = np.radians(10)) -> tuple[np.ndarray]:
+    """
+    Samples func on the domain adaptively. Starting from a coarse grid, intervals are halved while the value in the middle of the interval
+    differs from the linear interpolation by more than tolerance (relative to the height of the curve) or while the two halves of the interval
+    bend by more than max_angle. Intervals touching singularities are refined as well. All midpoints of one round of refinement are evaluated by func
+    in a single vectorized call. The number of evaluations does not exceed budget.
+    """
+    a,b = domain
+    x = np.linspace(a, b, min(initial, budget))
+    y = np.asarray(func(x), dtype=float)
+    width = b - a
+    height = _scale(y)
+    min_width = abs(width) * 1e-9
+
+    # intervals which are still refined, given by their left end
+    candidates = np.arange(len(x) - 1)
+    while len(candidates) > 0 and len(x) < budget:
+        candidates = candidates[:budget - len(x)]
+        x0 = x[candidates] ; x1 = x[candidates + 1]
+        y0 = y[candidates] ; y1 = y[candidates + 1]
+        xm = (x0 + x1) / 2
+        ym = np.asarray(func(xm), dtype=float)
+
+        with np.errstate(all="ignore"):
+            error = np.abs(ym - (y0 + y1) / 2) / height
+            # angle between the halves of the interval in coordinates normalized to the plot
+            dx = (xm - x0) / width
+            left = np.arctan2((ym - y0) / height, dx)
+            right = np.arctan2((y1 - ym) / height, dx)
+            angle = np.abs(right - left)
+
+        finite = np.isfinite(y0) & np.isfinite(ym) & np.isfinite(y1)
+        singular = ~finite & (np.isfinite(y0) | np.isfinite(ym) | np.isfinite(y1))
+        refine = ((finite & ((error > tolerance) | (angle > max_angle))) | singular) & (np.abs(x1 - x0) > min_width)
+
+        # midpoints are kept even where the interval is settled, they were evaluated already
+        order = np.argsort(np.concatenate([x, xm]), kind="stable")
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        x = np.concatenate([x, xm])[order]
+        y = np.concatenate([y, ym])[order]
+
+        # both halves of a refined interval are refined in the next round
+        left_ends = position[candidates[refine]]
+        candidates = np.sort(np.concatenate([left_ends, left_ends + 1]))
+    return x, y
+
+class SampleBlocks:
+    """
+    Samples a function on equidistant grids whose step is a power of two, level of detail is chosen by the requested resolution.
+    The samples are cached in blocks of a fixed number of samples, so only blocks which were not sampled before are evaluated
+    when the sampled interval moves or grows.
+    """
+    def __init__(self, func: callable, size: int = 256, maxsize: int = 512):
+        self.func = func
+        self.size = size
+        self.blocks = LRUCache(maxsize)
+
+    def block_grid(self, level: int, index: int) -> np.ndarray:
+        """
+        Returns the samples of a block, the last sample is shared with the following block.
+        """
+        step = 2.0**level
+        return (index*self.size + np.arange(self.size + 1)) * step
+
+    def sample(self, start: float, stop: float, resolution: int) -> tuple[np.ndarray]:
+        """
+        Samples the interval (start, stop) with at least resolution samples.
+        """
+        step = (stop - start) / max(resolution, 1)
+        level = int(np.floor(np.log2(step)))
+        width = self.size * 2.0**level
+        keys = [(level, index) for index in range(int(np.floor(start/width)), int(np.floor(stop/width)) + 1)]
+
+        missing = [key for key in keys if key not in self.blocks]
+        if missing:
+            # all missing blocks are evaluated in a single vectorized call
+            x = np.concatenate([self.block_grid(*key) for key in missing])
+            y = np.broadcast_to(np.asarray(self.func(x), dtype=float), x.shape)
+            for key, values in zip(missing, np.split(y, len(missing))):
+                self.blocks.put(key, values)
+
+        x = np.concatenate([self.block_grid(*key)[:-1] for key in keys] + [self.block_grid(*keys[-1])[-1:]])
+        y = np.concatenate([self.blocks.get(key)[:-1] for key in keys] + [self.blocks.get(keys[-1])[-1:]])
+        return x, y
+
+class PlotData:
+    """
+    This data type stores information about an expression to be plotted.
+    """
+    def __init__(self, expr, vars: list[str] = ["x"], domain: tuple[int] = (-10,10), precision:float = 0.01, data: tuple[np.ndarray] = None, sampling: tuple = None) -> None:
+        self.expr = expr # Atom like expr
+        self.domain = domain
+        self.precision = precision
+        self.vars = vars
+        self.data = data # precomputed (x, y) samples
+        self.sampling = sampling # (tolerance, budget) of adaptive sampling, uniform sampling if None
+        self.blocks = None # cached samples of viewed intervals
+
+    def grid(self) -> np.ndarray:
+        """
+        Discretizes the domain.
+        """
+        return uniform_grid(self.domain, self.precision)
+
+    def evaluator(self) -> callable:
+        """
+        Returns a function which evaluates the expression on an array of samples.
+        """
+        try:
+            return self.expr.compile(self.vars[:1])
+        except Exception:
+            return self.__evaluate
+
+    def __evaluate(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluates an expression which could not be compiled, on the whole array with numpy ufuncs if possible.
+        """
+        try:
+            return self.expr.eval_array({self.vars[0]: x})
+        except Exception:
+            # scalar evaluation is kept for expressions that can not be evaluated on arrays
+            return np.array([self.expr({self.vars[0]:i}) for i in x])
+
+    def generate(self) -> tuple[np.ndarray]:
+        """
+        Generates data for plotting. The samples are kept, so the data is generated only once.
+        """
+        if self.data is None:
+            with profiler.phase("sample", expr=self.expr):
+                func = self.evaluator()
+                if self.sampling:
+                    self.data = adaptive_samples(func, self.domain, *self.sampling)
+                else:
+                    x = self.grid()
+                    self.data = x,func(x)
+        return self.data
+
+    def view(self, start: float, stop: float, resolution: int) -> tuple[np.ndarray]:
+        """
+        Generates data for plotting the interval (start, stop) with at least resolution samples, e.g. one sample per pixel.
+        """
+        if stop <= start:
+            return self.generate()
+        if self.sampling:
+            return adaptive_samples(self.evaluator(), (start, stop), *self.sampling)
+        if self.blocks is None:
+            self.blocks = SampleBlocks(self.evaluator())
+        return self.blocks.sample(start, stop, resolution)
@@ -0,0 +1,170 @@
+from array import array
+import numpy as np
+
+from .atoms.compilers import CompileError
+
+# for type hinting
+from .atoms import Atom
+
+# operations with a fixed opcode, other functions are kept in the function pool of the tape
+OPERATIONS = [np.add, np.subtract, np.multiply, np.divide, np.power, np.sin, np.cos, np.tan, np.exp, np.log]
+
+class TapeBuilder:
+    """
+    Lowers expressions into a Tape. It accepts the same calls from the compilers of the nodes as KernelBuilder, but operands are slots
+    of the tape instead of names of variables. Slots are numbered variables first, then constants, then results of the instructions.
+    Identical operations on identical operands are emitted only once.
+    """
+    def __init__(self, vars: list[str]):
+        self.vars = list(vars)
+        self.constants = []
+        self.functions = []
+        self.instructions = [] # (opcode, arg0, arg1), arg1 is -1 for functions of one argument
+        self.emitted = {}
+        self.nodes = {}
+
+    def emit(self, expr) -> tuple:
+        """
+        Emits the expression and returns the slot which holds its value. Structurally equal subexpressions are emitted only once.
+        """
+        try:
+            return self.nodes[expr]
+        except KeyError:
+            slot = expr.get_compiler().emit(expr, self)
+            self.nodes[expr] = slot
+            return slot
+
+    def var(self, name: str) -> tuple:
+        try:
+            return ("var", self.vars.index(name))
+        except ValueError:
+            raise CompileError(f"Var {name} has no specified value.")
+
+    def constant(self, value) -> tuple:
+        key = ("const", float(value))
+        if key not in self.emitted:
+            self.emitted[key] = key[0], len(self.constants)
+            self.constants.append(float(value))
+        return self.emitted[key]
+
+    def call(self, func, *args: tuple) -> tuple:
+        """
+        Emits an operation on already emitted operands and returns the slot of its result.
+        """
+        if len(args) > 2:
+            raise CompileError(f"Function {func} of {len(args)} arguments can not be lowered to a tape.")
+        if func in OPERATIONS:
+            opcode = OPERATIONS.index(func)
+        else:
+            if func not in self.functions:
+                self.functions.append(func)
+            opcode = len(OPERATIONS) + self.functions.index(func)
+        key = (opcode, args)
+        if key not in self.emitted:
+            self.emitted[key] = ("temp", len(self.instructions))
+            self.instructions.append((opcode,) + args)
+        return self.emitted[key]
+
+    def build(self, outputs: list[tuple]) -> "Tape":
+        """
+        Numbers the slots and assigns buffers to the results of the instructions. A buffer is reused as soon as the last instruction
+        that reads it has run, buffers of the outputs are never reused.
+        """
+        temps = len(self.vars) + len(self.constants)
+        def number(slot):
+            if slot == -1:
+                return -1
+            kind, index = slot
+            return {"var": 0, "const": len(self.vars), "temp": temps}[kind] + index
+
+        code = [[opcode] + [number(arg) for arg in args] + [-1] * (2 - len(args)) for opcode, *args in self.instructions]
+        outputs = [number(slot) for slot in outputs]
+        last_use = {}
+        for i, (_, left, right) in enumerate(code):
+            last_use[left] = last_use[right] = i
+        for slot in outputs:
+            last_use[slot] = len(code)
+
+        free, buffers, registers = [], [], 0
+        for i, (_, left, right) in enumerate(code):
+            for arg in {left, right}:
+                if arg >= temps and last_use[arg] == i:
+                    # ufuncs may write into the buffer of their operand
+                    free.append(buffers[arg - temps])
+            if free:
+                buffers.append(free.pop())
+            else:
+                buffers.append(registers)
+                registers += 1
+            if last_use.get(temps + i, -1) < i:
+                # an unused result, e.g. of an expression equal to its operand
+                free.append(buffers[-1])
+
+        flat = array("i", [value for instruction in code for value in instruction])
+        return Tape(self.vars, flat, array("d", self.constants), array("i", buffers), array("i", outputs), registers, self.functions)
+
+class Tape:
+    """
+    Flat representation of expressions for evaluation. Instructions are stored in postfix order as (opcode, operand, operand) triples
+    of an integer array and numbers are stored in a pool of constants. Every instruction writes its result into one of a few buffers,
+    which are allocated once per shape of the samples and reused by the following calls.
+    A tape without custom functions holds only arrays, so it is small and cheap to pickle, e.g. to send it to worker processes.
+    """
+    def __init__(self, vars: list[str], code: array, constants: array, buffers: array, outputs: array, registers: int, functions: list = ()):
+        self.vars = list(vars)
+        self.code = code
+        self.constants = constants
+        self.buffers = buffers # buffer of the result of each instruction
+        self.outputs = outputs # slots of the results of the expressions
+        self.registers = registers
+        self.functions = list(functions) # functions without opcode, called with opcodes from len(OPERATIONS) on
+        self.__pool = {}
+
+    def __len__(self) -> int:
+        return len(self.code) // 3
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state["_Tape__pool"] = {}
+        return state
+
+    def pool(self, shape: tuple[int]) -> list[np.ndarray]:
+        """
+        Returns the buffers for samples of the shape. Only the buffers of the last shape are kept.
+        """
+        if shape not in self.__pool:
+            self.__pool = {shape: [np.empty(shape) for _ in range(self.registers)]}
+        return self.__pool[shape]
+
+    def __call__(self, *values: np.ndarray) -> list[np.ndarray]:
+        """
+        Evaluates the tape for the values of the variables. Returns one float array per expression.
+        """
+        if len(values) != len(self.vars):
+            raise CompileError(f"Tape of variables {self.vars} got {len(values)} values.")
+        values = [np.asarray(value, dtype=np.float64) for value in values]
+        shape = np.broadcast_shapes(*[np.shape(value) for value in values])
+        pool = self.pool(shape)
+        slots = values + [np.float64(c) for c in self.constants]
+        operations = OPERATIONS + self.functions
+        code = self.code
+        with np.errstate(all="ignore"):
+            for i in range(len(self)):
+                opcode, left, right = code[3*i], code[3*i + 1], code[3*i + 2]
+                out = pool[self.buffers[i]]
+                func = operations[opcode]
+                args = (slots[left],) if right == -1 else (slots[left], slots[right])
+                if isinstance(func, np.ufunc):
+                    func(*args, out=out)
+                else:
+                    out[...] = func(*args)
+                slots.append(out)
+        return [np.broadcast_to(slots[slot], shape).astype(np.float64) for slot in self.outputs]
+
+def compile_tape(exprs: list[Atom], vars: list[str]) -> Tape:
+    """
+    Lowers expressions into a single tape which evaluates all of them. Common subexpressions are evaluated once.
+    """
+    builder = TapeBuilder(vars)
+    outputs = [builder.emit(expr) for expr in exprs]
+    return builder.build(outputs)
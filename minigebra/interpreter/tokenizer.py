@@ -1,46 +1,32 @@
 import re
+from typing import Iterator
 
-# the regex patterns specify substring in the beginning of a string with matching pattern
+# the regex patterns specify substring at the current position of a string with matching pattern
 tokens = [
-    [r"^\s+", 'WHITESPACE'], # selects whitespace, tabs, newlines at the beginning of a string
-    [r"^-?\d+(?:\.\d+)?", 'NUMBER'], # selects numbers at the beginning of a string including floats and negative numbers
-    [r"^[a-zA-Z]+", 'VAR'], # selects variables specified as characters or words consisting of letters
-    [r'^"[^"]+"', 'COMMAND'], # selects strings denoted by "string", only double quotes
-    [r"^\+", 'PLUS'], # selects plus sign
-    [r"^-", 'MINUS'], # selects minus sign
-    [r"^\*", 'MUL'], # selects multiplication sign
-    [r"^\^", 'EXP'], # selects exponentation sign
-    [r"^\/", 'DIV'], # selects division sign
-    [r"^\(", 'LPAR'], # selects left paranthesis sign
-    [r"^\)", 'RPAR'], # selects right paranthesis sign
-    [r"^,", 'COMMA'], # selects comma
+    [r"\s+", 'WHITESPACE'], # selects whitespace, tabs, newlines
+    [r"-?\d+(?:\.\d+)?", 'NUMBER'], # selects numbers including floats and negative numbers
+    [r"[a-zA-Z]+", 'VAR'], # selects variables specified as characters or words consisting of letters
+    [r'"[^"]+"', 'COMMAND'], # selects strings denoted by "string", only double quotes
+    [r"\+", 'PLUS'], # selects plus sign
+    [r"-", 'MINUS'], # selects minus sign
+    [r"\*", 'MUL'], # selects multiplication sign
+    [r"\^", 'EXP'], # selects exponentation sign
+    [r"\/", 'DIV'], # selects division sign
+    [r"\(", 'LPAR'], # selects left paranthesis sign
+    [r"\)", 'RPAR'], # selects right paranthesis sign
+    [r",", 'COMMA'], # selects comma
 ]
-tokens = [(re.compile(i), j) for i,j in tokens]
+# single alternation of named groups, the first pattern in the list that matches wins
+pattern = re.compile("|".join([f"(?P<{type}>{regex})" for regex, type in tokens]))
 
 class Tokenizer:
     """
     Generates tokens of type Atom from the input expression string.
     """
-    # the regex patterns specify substring in the beginning of a string with matching pattern
-    tokens = [
-        [r"^\s+", 'WHITESPACE'], # selects whitespace, tabs, newlines at the beginning of a string
-        [r"^-?\d+(?:\.\d+)?", 'NUMBER'], # selects numbers at the beginning of a string including floats and negative numbers
-        [r"^[a-zA-Z]+", 'VAR'], # selects variables specified as characters or words consisting of letters
-        [r'^"[^"]+"', 'COMMAND'], # selects strings denoted by "string", only double quotes
-        [r"^\+", 'PLUS'], # selects plus sign
-        [r"^-", 'MINUS'], # selects minus sign
-        [r"^\*", 'MUL'], # selects multiplication sign
-        [r"^\^", 'EXP'], # selects exponentation sign
-        [r"^\/", 'DIV'], # selects division sign
-        [r"^\(", 'LPAR'], # selects left paranthesis sign
-        [r"^\)", 'RPAR'], # selects right paranthesis sign
-        [r"^,", 'COMMA'], # selects comma
-    ]
-
     def __init__(self):
-        self.tokens = [(re.compile(i), j) for i,j in self.tokens]
         self.cursor = -1
         self.string = None
+        self.__tokens = iter(())
 
     def read(self, string: str) -> None:
         """
@@ -48,19 +34,26 @@ class Tokenizer:
         """
         self.cursor = 0
         self.string = string
+        self.__tokens = self.tokenize(string)
+
+    def tokenize(self, string: str) -> Iterator[dict]:
+        """
+        Lazily yields tokens of the string. The string is scanned in place, without copying its rest for each token.
+        """
+        match = pattern.match
+        position = 0
+        end = len(string)
+        while position < end:
+            found = match(string, position)
+            if not found:
+                yield {"token": None, "type": "INVALID_CHAR"}
+                return
+            position = self.cursor = found.end()
+            if found.lastgroup != 'WHITESPACE':
+                yield {"token": found.group(), "type": found.lastgroup}
 
     def next_match(self) -> dict:
         """
-        Finds next token.
+        Finds next token. Returns None at the end of the input.
         """
-        if self.cursor != len(self.string):
-            text = self.string[self.cursor:]
-            for (pattern, type) in self.tokens:
-                match = pattern.match(text)
-                if match:
-                    self.cursor += len(match[0])
-                    if type == 'WHITESPACE':
-                        return self.next_match()
-                    else:
-                        return {"token": match[0], "type": type}
-            return {"token": None, "type": "INVALID_CHAR"}
+        return next(self.__tokens, None)
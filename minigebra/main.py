@@ -1,8 +1,5 @@
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QFont
 import sys
 
-from .gui import MainWindow
 from .interpreter import Interpreter
 
 
@@ -11,6 +8,10 @@ def run(type: str) -> None:
     Runs the application in either GUI or CLI version. Specify type as type="GUI" for graphical user interface or type="CLI" for command line version.
     """
     if type == "GUI":
+        # Qt is imported only by the gui, so the interpreter and the batch mode run without it
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtGui import QFont
+        from .gui import MainWindow
         app = QApplication(sys.argv)
         font = QFont("Arimo for Powerline", 13)
         app.setFont(font)
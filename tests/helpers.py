@@ -0,0 +1,12 @@
+"""
+Helpers shared by the tests.
+"""
+from minigebra.interpreter.atoms import BUILT_IN_FUNCTIONS
+from minigebra.interpreter.parser import Parser
+from minigebra.interpreter.tokenizer import Tokenizer
+
+def parse(text: str):
+    """
+    Parses a single expression.
+    """
+    return Parser(Tokenizer(), BUILT_IN_FUNCTIONS).parse_expr(text)
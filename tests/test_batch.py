@@ -0,0 +1,41 @@
+"""
+JSON Lines records and exit code of the headless batch mode.
+"""
+import io
+import json
+import os
+
+import numpy as np
+
+from minigebra.interpreter.batch import interpret_stream, main, run_batch
+
+def test_records_of_expressions():
+    records = list(interpret_stream(["x^2+x*x; sin(x)", "", '"diff_order: 2"; x']))
+    assert records[0] == {"line": 1, "index": 0, "input": "x^2+x*x", "simplified": "2(x ^ 2)", "derivatives": ["4x"], "latex": ["2(x^{2})", "4x"]}
+    assert [(r["line"], r["index"], r["input"]) for r in records] == [(1, 0, "x^2+x*x"), (1, 1, "sin(x)"), (3, 0, "x")]
+    # commands apply to the following lines
+    assert records[2]["derivatives"] == ["1", "0"]
+
+def test_failed_line_gives_error_record():
+    records = list(interpret_stream(["foo(", "x"]))
+    assert records[0]["line"] == 1 and records[0]["input"] == "foo(" and "error" in records[0]
+    assert records[1]["simplified"] == "x"
+
+def test_run_batch_counts_failures():
+    output = io.StringIO()
+    assert run_batch(io.StringIO("x\nfoo(\n"), output) == 1
+    assert [json.loads(line)["line"] for line in output.getvalue().splitlines()] == [1, 2]
+
+def test_exit_code_and_samples(tmp_path):
+    source = tmp_path / "input.txt"
+    output = tmp_path / "output.jsonl"
+    source.write_text('"domain: (0, 1)"; "precision: 0.25"; x^2\n')
+    assert main([str(source), "-o", str(output), "--samples", str(tmp_path / "samples")]) == 0
+    record = json.loads(output.read_text())
+    assert len(record["samples"]) == 2
+    x, y = np.load(record["samples"][0])
+    assert np.allclose(y, x ** 2)
+    assert all([os.path.exists(path) for path in record["samples"]])
+
+    source.write_text("x\n(\n")
+    assert main([str(source), "-o", str(output)]) == 1
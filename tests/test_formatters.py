@@ -0,0 +1,16 @@
+"""
+Rendering of expressions to text and latex.
+"""
+from tests.helpers import parse
+
+def test_every_rendered_node_caches_its_text():
+    expr = parse("x^2 + sin(x)*3 + exp(x)")
+    assert str(expr) == "x ^ 2 + sin(x) * 3 + exp(x)"
+    assert [arg._text for arg in expr.args] == ["x ^ 2", "sin(x) * 3", "exp(x)"]
+    assert expr.args[1].args[0].args[0]._text == "x"
+
+def test_latex_is_cached_apart_from_text():
+    expr = parse("x^2 + 1")
+    assert expr.print("latex") == "x^{2} + 1"
+    assert expr.args[0]._latex == "x^{2}"
+    assert str(expr.args[0]) == "x ^ 2"
@@ -0,0 +1,14 @@
+"""
+Expressions and their derivatives held by the interpreter.
+"""
+from minigebra.interpreter import Interpreter
+
+def test_derivatives_are_produced_on_demand():
+    interpreter = Interpreter()
+    interpreter.interpret_text('"diff_order: 2"; x*x + x')
+    tower, = interpreter.database.towers
+    assert len(tower.orders) == 1
+    interpreter.diff(1)
+    assert len(tower.orders) == 2
+    interpreter.simplify()
+    assert [str(expr) for expr in tower.orders] == ["x ^ 2 + x", "2x + 1", "2"]
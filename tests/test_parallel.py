@@ -0,0 +1,35 @@
+"""
+Evaluation of plots by the pool of worker processes.
+"""
+import numpy as np
+
+from minigebra.interpreter import Interpreter
+from minigebra.interpreter.parallel import ParallelSampler
+from minigebra.interpreter.planner import EvaluationPlan
+
+INPUT = '"diff_order: 2"; "domain: (-5, 5)"; "precision: 0.1"; x^2 + x; sin(x)*x; ln(x)/(x + 1); 3'
+
+def expressions() -> list:
+    interpreter = Interpreter()
+    interpreter.interpret_text(INPUT)
+    return [expr for group in interpreter.database.expressions for expr in group]
+
+def test_pool_matches_serial_evaluation():
+    exprs = expressions()
+    x = np.linspace(-5, 5, 101)
+    sampler = ParallelSampler(2, min_samples=0)
+    try:
+        assert sampler.parallel(len(exprs), len(x))
+        parallel = sampler(exprs, ["x"], x)
+    finally:
+        sampler.shutdown()
+    serial = EvaluationPlan([exprs], ["x"])(x)[0]
+    assert all([np.allclose(p, s, equal_nan=True) for p, s in zip(parallel, serial)])
+
+def test_workers_command_sets_threshold():
+    interpreter = Interpreter()
+    interpreter.interpret_text('"workers: 2, 0"; x')
+    assert interpreter.database.workers == 2
+    assert interpreter.database.min_samples == 0
+    assert ParallelSampler(1, min_samples=0).parallel(10, 10) is False
+    assert ParallelSampler(2).parallel(2, 10) is False
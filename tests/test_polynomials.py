@@ -0,0 +1,39 @@
+"""
+Behaviour of the canonical polynomial form of sums and products.
+"""
+from fractions import Fraction
+
+from minigebra.interpreter.atoms import Var
+from minigebra.interpreter.atoms import polynomials
+from tests.helpers import parse
+
+def collected(text: str) -> str:
+    return str(polynomials.collect(parse(text)))
+
+def test_like_terms_are_collected():
+    x = Var("x")
+    assert polynomials.from_expr(parse("x*x*3 + 2*x*x - x")).terms == {((x, 2),): 5, ((x, 1),): -1}
+    assert collected("y*x + x*y") == "2xy"
+    assert collected("x - x") == "0"
+
+def test_division_by_numbers_keeps_coefficients_exact():
+    x = Var("x")
+    terms = polynomials.from_expr(parse("x/2 + x/3")).terms
+    assert terms == {((x, 1),): Fraction(5, 6)}
+    assert type(terms[((x, 1),)]) is Fraction
+    assert collected("x/3 + x/3 + x/3") == "x"
+
+def test_negative_integer_powers():
+    x = Var("x")
+    assert polynomials.from_expr(parse("x^(-1)*2")).terms == {((x, -1),): 2}
+    assert collected("x^(-2)*x^3") == "x"
+    assert collected("x^(-1)*x") == "1"
+
+def test_product_of_several_sums_stays_factored():
+    assert collected("(x + 1)*(x + 2)*x") == "x(x + 1)(x + 2)"
+    # a single sum is distributed
+    assert collected("(x + 1)*x") == "x ^ 2 + x"
+
+def test_terms_are_ordered_by_descending_degree():
+    assert collected("x + x^3 + 1 + x^2") == "x ^ 3 + x ^ 2 + x + 1"
+    assert collected("3 + x*x*x - x") == "x ^ 3 - x + 3"
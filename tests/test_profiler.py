@@ -0,0 +1,54 @@
+"""
+Profiling and cancellation of inputs interpreted in several threads.
+"""
+import threading
+
+import pytest
+
+from minigebra.interpreter.atoms import simplifiers
+from minigebra.interpreter.profiler import profiler
+from tests.helpers import parse
+
+def in_thread(func: callable):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(func()))
+    thread.start()
+    thread.join()
+    return results[0]
+
+def test_snapshot_holds_phases_of_its_thread(capsys):
+    profiler.enable()
+    try:
+        def job():
+            with profiler.phase("job"):
+                profiler.count("nodes", 3)
+            return profiler.snapshot()
+        snapshot = in_thread(job)
+        with profiler.phase("draw"):
+            pass
+        assert [event[0] for event in snapshot[0]] == ["job"]
+        assert snapshot[1] == {"nodes": 3}
+        assert [event[0] for event in profiler.events] == ["draw"]
+        profiler.report(snapshot=snapshot)
+        summary = capsys.readouterr().out
+        assert "job" in summary and "draw" in summary and "nodes" in summary
+        assert profiler.events == []
+    finally:
+        profiler.disable()
+
+def test_cancellation_applies_to_its_thread():
+    flag = threading.Event()
+    flag.set()
+    expr = parse("x*x + sin(x)*3")
+    def cancelled():
+        with simplifiers.cancellable(flag):
+            try:
+                expr.simplify()
+            except simplifiers.Cancelled:
+                return True
+        return False
+    with simplifiers.cancellable(threading.Event()):
+        assert in_thread(cancelled)
+        assert str(expr.simplify()) == "x ^ 2 + 3sin(x)"
+    with pytest.raises(simplifiers.Cancelled), simplifiers.cancellable(flag):
+        parse("x + x").simplify()
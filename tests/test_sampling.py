@@ -0,0 +1,67 @@
+"""
+Sampling of plots: evaluation of expressions on arrays and adaptive refinement.
+"""
+import numpy as np
+
+from minigebra.interpreter.atoms import Atom
+from minigebra.interpreter.sampling import PlotData, adaptive_samples
+from tests.helpers import parse
+
+def test_expressions_which_do_not_compile_are_evaluated_on_arrays(monkeypatch):
+    expr = parse("x^2 + sin(x)")
+    calls = []
+    eval_array = Atom.eval_array
+    def fail(self, vars):
+        raise Exception("can not compile")
+    def record(self, dict):
+        calls.append(self)
+        return eval_array(self, dict)
+    monkeypatch.setattr(Atom, "compile", fail)
+    monkeypatch.setattr(Atom, "eval_array", record)
+    x, y = PlotData(expr, ["x"], (-1, 1), 0.5).generate()
+    assert calls == [expr]
+    assert np.allclose(y, x ** 2 + np.sin(x))
+
+def counted(func: callable) -> tuple:
+    """
+    Wraps func, the returned list holds the number of samples of each call.
+    """
+    calls = []
+    def wrapper(x):
+        calls.append(len(x))
+        return func(x)
+    return wrapper, calls
+
+def test_straight_lines_are_not_refined():
+    func, calls = counted(lambda x: 2 * x + 1)
+    x, y = adaptive_samples(func, (-1, 1), initial=16)
+    assert len(x) == 16 + 15
+    assert calls == [16, 15]
+    assert np.allclose(y, 2 * x + 1)
+
+def test_samples_are_placed_where_the_curve_bends():
+    x, y = adaptive_samples(lambda x: np.abs(x - 0.3), (-1, 1), tolerance=1e-4, initial=8)
+    assert np.all(np.diff(x) > 0)
+    assert np.allclose(y, np.abs(x - 0.3))
+    steps = np.diff(x)
+    # the kink is refined, the straight parts keep the first round of midpoints
+    assert steps[np.argmin(np.abs(x[:-1] - 0.3))] < steps[0] / 100
+    assert np.isclose(steps[0], 1 / 7) and np.isclose(steps[-1], 1 / 7)
+
+def test_budget_caps_the_evaluations():
+    func, calls = counted(np.sin)
+    x, y = adaptive_samples(lambda x: func(50 * x), (-10, 10), tolerance=1e-9, budget=500, initial=64)
+    assert sum(calls) == len(x) <= 500
+    assert len(x) == 500
+    assert np.allclose(y, np.sin(50 * x))
+
+def test_singularities_are_refined():
+    with np.errstate(all="ignore"):
+        x, _ = adaptive_samples(lambda x: 1 / x, (-1, 1), initial=9)
+    assert np.min(np.abs(x[x != 0])) < 1e-3
+
+def test_adaptive_plot_data():
+    plot = PlotData(parse("x^2"), ["x"], (-2, 2), 0.1, sampling=(1e-3, 200))
+    x, y = plot.generate()
+    assert len(x) <= 200
+    assert np.allclose(y, x ** 2)
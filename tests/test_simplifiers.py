@@ -0,0 +1,25 @@
+"""
+Behaviour of the simplification rules, e.g. python -m pytest tests.
+"""
+from tests.helpers import parse
+
+def simplified(text: str) -> str:
+    return str(parse(text).simplify())
+
+def test_exp_of_logarithm():
+    assert simplified("exp(2*ln(x))") == "x ^ 2"
+    assert simplified("exp(ln(x)*x)") == "x ^ x"
+
+def test_difference_of_logarithms():
+    assert simplified("ln(a) - ln(b)") == "ln(a / b)"
+    assert simplified("ln(b) - ln(a)") == "ln(b / a)"
+
+def test_rules_apply_to_pairs_of_longer_chains():
+    assert simplified("ln(x) + ln(y) + ln(z)") == "ln(xyz)"
+    assert simplified("ln(x) - ln(y) + z") == "ln(x / y) + z"
+    assert simplified("2*x*x^0.5") == "2(x ^ 1.5)"
+    assert simplified("exp(3*x*ln(y))") == "y ^ (3x)"
+
+def test_rules_apply_to_products_in_sums():
+    derivative = parse("2*x*x^0.5").diff().simplify()
+    assert str(derivative) == "3(x ^ 0.5)"
@@ -0,0 +1,50 @@
+"""
+Evaluation of expressions by tapes with reused buffers.
+"""
+import pickle
+
+import numpy as np
+
+from minigebra.interpreter.tape import compile_tape
+from tests.helpers import parse
+
+TEXTS = ["x^2 + sin(x)*x", "sin(x)*x - 3", "exp(x/4) + ln(x^2 + 1)", "2", "x"]
+
+def reference(x: np.ndarray) -> list[np.ndarray]:
+    return [expr.eval_array({"x": x}) for expr in map(parse, TEXTS)]
+
+def test_tape_matches_array_evaluation():
+    x = np.linspace(-3, 3, 41)
+    tape = compile_tape([parse(text) for text in TEXTS], ["x"])
+    assert all([np.allclose(a, b) for a, b in zip(tape(x), reference(x))])
+
+def test_buffers_are_reused_along_a_chain():
+    tape = compile_tape([parse("sin(cos(sin(cos(sin(cos(x))))))")], ["x"])
+    assert len(tape) == 6
+    # every function writes into the buffer of its operand
+    assert tape.registers == 1
+    x = np.linspace(-1, 1, 11)
+    assert np.allclose(tape(x)[0], np.sin(np.cos(np.sin(np.cos(np.sin(np.cos(x)))))))
+
+def test_results_outlive_the_next_call():
+    tape = compile_tape([parse(text) for text in TEXTS], ["x"])
+    x = np.linspace(-3, 3, 41)
+    first = tape(x)
+    pool = tape.pool(x.shape)
+    tape(x + 1)
+    assert tape.pool(x.shape) is pool
+    assert all([np.allclose(a, b) for a, b in zip(first, reference(x))])
+
+def test_new_shape_gets_new_buffers():
+    tape = compile_tape([parse("x^2 + 1")], ["x"])
+    assert np.allclose(tape(np.arange(3.0))[0], [1, 2, 5])
+    assert np.allclose(tape(np.arange(5.0))[0], [1, 2, 5, 10, 17])
+    assert np.allclose(tape(2.0)[0], 5)
+
+def test_pickled_tape_drops_its_buffers():
+    tape = compile_tape([parse(text) for text in TEXTS], ["x"])
+    x = np.linspace(-3, 3, 41)
+    tape(x)
+    copy = pickle.loads(pickle.dumps(tape))
+    assert copy._Tape__pool == {}
+    assert all([np.allclose(a, b) for a, b in zip(copy(x), reference(x))])
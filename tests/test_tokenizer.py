@@ -0,0 +1,33 @@
+"""
+Tokens produced by the master regex of the tokenizer.
+"""
+from minigebra.interpreter.tokenizer import Tokenizer
+
+def tokens(text: str) -> list[tuple]:
+    tokenizer = Tokenizer()
+    tokenizer.read(text)
+    result = []
+    while (match := tokenizer.next_match()) is not None:
+        result.append((match["token"], match["type"]))
+    return result
+
+def test_operators_names_and_whitespace():
+    assert tokens("sin(x) +\tab / 2") == [("sin", "VAR"), ("(", "LPAR"), ("x", "VAR"), (")", "RPAR"), ("+", "PLUS"), ("ab", "VAR"), ("/", "DIV"), ("2", "NUMBER")]
+    assert tokens("f(x, y)") == [("f", "VAR"), ("(", "LPAR"), ("x", "VAR"), (",", "COMMA"), ("y", "VAR"), (")", "RPAR")]
+    assert tokens("") == []
+
+def test_first_matching_pattern_wins():
+    # a minus sign followed by digits is read as a negative number, as by the original list of patterns
+    assert tokens("2.5*x^-3") == [("2.5", "NUMBER"), ("*", "MUL"), ("x", "VAR"), ("^", "EXP"), ("-3", "NUMBER")]
+    assert tokens("x - y") == [("x", "VAR"), ("-", "MINUS"), ("y", "VAR")]
+
+def test_commands_are_single_tokens():
+    assert tokens('"domain: (-1, 2)"; x')[0] == ('"domain: (-1, 2)"', "COMMAND")
+
+def test_invalid_character_ends_the_tokens():
+    tokenizer = Tokenizer()
+    tokenizer.read("x $ 1")
+    assert tokenizer.next_match() == {"token": "x", "type": "VAR"}
+    assert tokenizer.next_match() == {"token": None, "type": "INVALID_CHAR"}
+    assert tokenizer.next_match() is None
+    assert tokenizer.cursor == 2